@@ -1,6 +1,7 @@
 #v5.0: Added retry and delay without caching for data loading from google sheet
 import streamlit as st
 import pandas as pd
+import numpy as np
 import datetime
 import yfinance as yf
 from datetime import date, timedelta
@@ -11,267 +12,2594 @@ import locale
 import streamlit.components.v1 as components  # Import the components module
 import time
 import random
+import io
+import os
+import json
+import hashlib
+import threading
+import logging
+import functools
+import requests
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from functools import cached_property
 
 #***********************
 # Hard-coded credentials
 USERNAME = "prayan"
 PASSWORD = "prayan"
 
-# Initialize session state for login
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
+# Login page function
+def login():
+    st.title("Login")
+    
+    # Input fields for username and password
+    with st.form(key="login_form", clear_on_submit=True):
+        username = st.text_input("Username")
+        password = st.text_input("Password", type="password")
+
+        # Login button
+        submit_button = st.form_submit_button(label="Login")
+        if submit_button:
+            if username == USERNAME and password == PASSWORD:
+                st.session_state.logged_in = True
+                st.success("Logged in successfully!")
+                st.rerun()  # Reload the app after login
+            else:
+                st.error("Invalid username or password")
+
+#***********************
+# Diagnostics
+# Timing spans around page sections and outbound requests. Every span is logged as one
+# JSON line on the "dashboard.spans" logger; DASHBOARD_SPAN_LOG=<file> (or "-" for stderr)
+# turns that on. The current run's spans are listed in the sidebar when Diagnostics is on.
+SPAN_LOG = os.environ.get("DASHBOARD_SPAN_LOG")
+span_logger = logging.getLogger("dashboard.spans")
+
+class Diagnostics:
+    """Span sink shared by every session.
+
+    A page run collects its own spans in a thread-local list (start_run); all spans
+    also go to a bounded process-wide tail used for the percentile summary.
+    """
+
+    def __init__(self, keep=2000):
+        self.recent = deque(maxlen=keep)
+        self._local = threading.local()
+
+    def start_run(self):
+        self._local.spans = []
+        return self._local.spans
+
+    def run_spans(self):
+        return getattr(self._local, "spans", None)
+
+    def bind(self, spans):
+        """Collects this thread's spans into `spans` (worker threads of a page run)."""
+        self._local.spans = spans
+
+    @contextmanager
+    def span(self, name, **fields):
+        """Times the with-block; the yielded dict takes extra fields (cache state, retries...)."""
+        record = {"span": name, **fields}
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            record["ts"] = round(time.time(), 3)
+            spans = self.run_spans()
+            if spans is not None:
+                spans.append(record)
+            self.recent.append(record)
+            span_logger.info(json.dumps(record, default=str))
+
+    def summary(self):
+        """Count, p50, p95 and max milliseconds per span name over the recent tail."""
+        frame = pd.DataFrame(list(self.recent), columns=["span", "ms"])
+        if frame.empty:
+            return frame
+        grouped = frame.groupby("span")["ms"]
+        return pd.DataFrame({
+            "count": grouped.count(),
+            "p50 ms": grouped.median(),
+            "p95 ms": grouped.quantile(0.95),
+            "max ms": grouped.max(),
+        }).sort_values("p95 ms", ascending=False)
+
+@st.cache_resource(show_spinner=False)
+def get_diagnostics():
+    if SPAN_LOG and not span_logger.handlers:
+        handler = logging.StreamHandler() if SPAN_LOG == "-" else logging.FileHandler(SPAN_LOG)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        span_logger.addHandler(handler)
+        span_logger.setLevel(logging.INFO)
+        span_logger.propagate = False
+    return Diagnostics()
+
+def span(name, **fields):
+    """Shortcut for get_diagnostics().span(); use as `with span("stage") as record:`."""
+    return get_diagnostics().span(name, **fields)
+
+def timed_section(func):
+    """Wraps a page section in a span, so fragment reruns are timed too."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(f"section.{func.__name__}"):
+            return func(*args, **kwargs)
+    return wrapper
+
+#***********************
+# Data sources
+# Every outbound call goes through one data source, picked with DASHBOARD_DATA_SOURCE:
+#   live   - Google Sheets over HTTP and Yahoo Finance through yfinance (default)
+#   record - live, and every response is also saved under DASHBOARD_REPLAY_DIR
+#   replay - answers only from DASHBOARD_REPLAY_DIR, never touches the network
+# DASHBOARD_INJECT_LATENCY ("0.3" or "0.1-0.8" seconds per call) and DASHBOARD_INJECT_FAILURES
+# (probability 0..1) slow down or fail calls of any backend; DASHBOARD_INJECT_SEED repeats a run.
+DATA_SOURCE = os.environ.get("DASHBOARD_DATA_SOURCE", "live")
+REPLAY_DIR = os.environ.get("DASHBOARD_REPLAY_DIR")  # Defaults to <DATA_DIR>/replay
+INJECT_LATENCY = os.environ.get("DASHBOARD_INJECT_LATENCY", "")
+INJECT_FAILURES = float(os.environ.get("DASHBOARD_INJECT_FAILURES", "0"))
+INJECT_SEED = os.environ.get("DASHBOARD_INJECT_SEED")
+# Every source sits behind one circuit breaker per endpoint (each sheet URL, Yahoo's batched download,
+# Yahoo's lookups of each ticker): after
+# BREAKER_THRESHOLD failures in a row calls fail fast for BREAKER_COOLDOWN seconds, then one trial
+# call decides whether the endpoint is back.
+BREAKER_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", "30"))
+
+@dataclass
+class SheetResponse:
+    status_code: int
+    content: bytes
+    headers: dict
+
+class LiveSource:
+    """The real endpoints."""
+
+    def get_sheet(self, url, headers, timeout):
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return SheetResponse(response.status_code, response.content, response.headers)
+
+    def download_quotes(self, tickers, timeout):
+        return yf.download(tickers, period="5d", interval="1d", group_by="ticker",
+                           auto_adjust=False, threads=True, progress=False, timeout=timeout)
+
+    def ticker_info(self, ticker):
+        return yf.Ticker(ticker).info
+
+    def ticker_history(self, ticker, period):
+        return yf.Ticker(ticker).history(period=period)
+
+class ReplayStore:
+    """Recorded responses on disk: sheets as CSV + headers JSON, frames as parquet, info as JSON."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, kind, key, ext):
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return os.path.join(self.root, f"{kind}-{digest}.{ext}")
+
+    def _write(self, path, data):
+        """Atomically writes bytes, or a DataFrame as parquet."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if isinstance(data, pd.DataFrame):
+            data.to_parquet(tmp)
+        else:
+            with open(tmp, "wb") as f:
+                f.write(data)
+        os.replace(tmp, path)
+
+    def save_sheet(self, url, response):
+        headers = {name: response.headers.get(name) for name in ("ETag", "Last-Modified")}
+        self._write(self._path("sheet", url, "csv"), response.content)
+        self._write(self._path("sheet", url, "json"), json.dumps(headers).encode())
+
+    def load_sheet(self, url):
+        with open(self._path("sheet", url, "csv"), "rb") as f:
+            content = f.read()
+        with open(self._path("sheet", url, "json")) as f:
+            headers = {name: value for name, value in json.load(f).items() if value}
+        return SheetResponse(200, content, headers)
+
+    def save_quotes(self, tickers, frame):
+        self._write(self._path("quotes", ",".join(sorted(tickers)), "parquet"), frame)
+
+    def load_quotes(self, tickers):
+        return pd.read_parquet(self._path("quotes", ",".join(sorted(tickers)), "parquet"))
+
+    def save_history(self, ticker, period, frame):
+        self._write(self._path("history", f"{ticker}|{period}", "parquet"), frame)
+
+    def load_history(self, ticker, period):
+        return pd.read_parquet(self._path("history", f"{ticker}|{period}", "parquet"))
+
+    def save_info(self, ticker, info):
+        self._write(self._path("info", ticker, "json"), json.dumps(info, default=str).encode())
+
+    def load_info(self, ticker):
+        with open(self._path("info", ticker, "json")) as f:
+            return json.load(f)
+
+class RecordingSource:
+    """Live calls whose responses are also written to a ReplayStore."""
+
+    def __init__(self, source, store):
+        self.source = source
+        self.store = store
+
+    def get_sheet(self, url, headers, timeout):
+        response = self.source.get_sheet(url, headers, timeout)
+        if response.status_code == 200:
+            self.store.save_sheet(url, response)
+        return response
+
+    def download_quotes(self, tickers, timeout):
+        frame = self.source.download_quotes(tickers, timeout)
+        if frame is not None and not frame.empty:
+            self.store.save_quotes(tickers, frame)
+        return frame
+
+    def ticker_info(self, ticker):
+        info = self.source.ticker_info(ticker)
+        self.store.save_info(ticker, info)
+        return info
+
+    def ticker_history(self, ticker, period):
+        frame = self.source.ticker_history(ticker, period)
+        self.store.save_history(ticker, period, frame)
+        return frame
+
+class ReplaySource:
+    """Serves recorded responses; anything never recorded fails like a dead endpoint."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def get_sheet(self, url, headers, timeout):
+        response = self.store.load_sheet(url)
+        etag = response.headers.get("ETag")
+        if etag and headers.get("If-None-Match") == etag:
+            return SheetResponse(304, b"", response.headers)
+        return response
+
+    def download_quotes(self, tickers, timeout):
+        return self.store.load_quotes(tickers)
+
+    def ticker_info(self, ticker):
+        return self.store.load_info(ticker)
+
+    def ticker_history(self, ticker, period):
+        return self.store.load_history(ticker, period)
+
+class FaultInjector:
+    """Wraps any source and adds latency and random failures to every call."""
+
+    def __init__(self, source, latency=(0.0, 0.0), failure_rate=0.0, seed=None):
+        self.source = source
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def __getattr__(self, name):
+        call = getattr(self.source, name)
+        def injected(*args, **kwargs):
+            low, high = self.latency
+            if high > 0:
+                time.sleep(self._random.uniform(low, high))
+            if self._random.random() < self.failure_rate:
+                raise ConnectionError(f"Injected failure in {name}")
+            return call(*args, **kwargs)
+        return injected
+
+class CircuitOpenError(ConnectionError):
+    pass
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open after `cooldown`."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False  # A half-open trial call is in flight
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        """Whether a call may go out now (in half-open state only one trial call at a time)."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0
+        return max(0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record(self, ok):
+        with self._lock:
+            self._trial = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.threshold:
+                    self.opened_at = time.monotonic()  # (Re)opens, also after a failed trial
+
+class GuardedSource:
+    """Wraps any source with a circuit breaker per endpoint.
+
+    A ticker that Yahoo cannot look up only trips its own breaker, never the
+    batched download or other tickers.
+    """
+
+    def __init__(self, source, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.source = source
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.breakers = {}  # endpoint -> CircuitBreaker
+        self._lock = threading.Lock()
+
+    def breaker(self, endpoint):
+        with self._lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(self.threshold, self.cooldown)
+            return self.breakers[endpoint]
+
+    @staticmethod
+    def endpoint(name, args):
+        if name == "get_sheet":
+            return f"sheet:{source_key(args[0])}"
+        if name == "download_quotes":
+            return "yahoo:download"
+        return f"yahoo:{args[0]}"  # ticker_info / ticker_history
+
+    def __getattr__(self, name):
+        call = getattr(self.source, name)
+        def guarded(*args, **kwargs):
+            endpoint = self.endpoint(name, args)
+            breaker = self.breaker(endpoint)
+            if not breaker.allow():
+                raise CircuitOpenError(f"{endpoint} is failing; next try in {breaker.retry_in():.0f}s")
+            try:
+                result = call(*args, **kwargs)
+            except Exception:
+                breaker.record(False)
+                raise
+            breaker.record(True)
+            return result
+        return guarded
+
+def parse_latency(text):
+    """"0.3" -> (0.3, 0.3), "0.1-0.8" -> (0.1, 0.8), "" -> no latency."""
+    if not text:
+        return 0.0, 0.0
+    low, _, high = text.partition("-")
+    return float(low), float(high or low)
+
+def make_data_source(kind="live", replay_dir=None, latency="", failure_rate=0.0, seed=None):
+    if kind == "live":
+        source = LiveSource()
+    elif kind == "record":
+        source = RecordingSource(LiveSource(), ReplayStore(replay_dir))
+    elif kind == "replay":
+        source = ReplaySource(ReplayStore(replay_dir))
+    else:
+        raise ValueError(f"Unknown data source {kind!r}; expected live, record or replay")
+    latency = parse_latency(latency)
+    if latency[1] > 0 or failure_rate > 0:
+        source = FaultInjector(source, latency, failure_rate, seed)
+    return GuardedSource(source)  # Outermost, so injected failures trip the breakers too
+
+@st.cache_resource(show_spinner=False)
+def get_data_source():
+    replay_dir = REPLAY_DIR or os.path.join(DATA_DIR, "replay")
+    return make_data_source(DATA_SOURCE, replay_dir, INJECT_LATENCY, INJECT_FAILURES, INJECT_SEED)
+
+#***********************
+# Fetch coordination
+# Every session in the server process fetches through one coordinator. Concurrent requests for
+# the same resource (a sheet URL, a ticker) ride on a single in-flight fetch, and each upstream
+# has a cap on simultaneous fetches, so the load on Google and Yahoo does not grow with viewers.
+FETCH_LIMITS = {
+    "sheet": int(os.environ.get("SHEET_FETCH_LIMIT", "4")),   # Distinct sheet downloads at once
+    "yahoo": int(os.environ.get("YAHOO_FETCH_LIMIT", "4")),   # Yahoo calls at once
+}
+
+class FetchCoordinator:
+    """Single-flight fetches with a concurrency limit per upstream.
+
+    `do(kind, key, fn)` runs fn() unless a fetch for (kind, key) is already in
+    flight, in which case it waits for that one and returns its result (or
+    raises its exception).
+    """
+
+    def __init__(self, limits):
+        self._slots = {kind: threading.BoundedSemaphore(limit) for kind, limit in limits.items()}
+        self._inflight = {}  # (kind, key) -> Future of the running fetch
+        self._lock = threading.Lock()
+        self.stats = {"fetches": 0, "shared": 0}
+
+    def do(self, kind, key, fn):
+        with self._lock:
+            flight = self._inflight.get((kind, key))
+            leader = flight is None
+            if leader:
+                flight = self._inflight[(kind, key)] = Future()
+                self.stats["fetches"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            with span("fetch.shared", kind=kind):
+                return flight.result()
+
+        try:
+            slot = self._slots.get(kind)
+            if slot is None:
+                result = fn()
+            else:
+                with slot:
+                    result = fn()
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[(kind, key)]
+
+    def inflight(self):
+        with self._lock:
+            return len(self._inflight)
+
+@st.cache_resource(show_spinner=False)
+def get_fetch_coordinator():
+    return FetchCoordinator(FETCH_LIMITS)
+
+# Retries wait base * 2**attempt seconds (capped), scaled by a random factor so retrying
+# processes spread out. Only background threads retry; a page run never sleeps on an upstream.
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# A full page run starts all of its independent fetches together and waits at most PAGE_DEADLINE
+# seconds for any of them, so first paint takes as long as the slowest source, not the sum.
+PAGE_DEADLINE = float(os.environ.get("PAGE_DEADLINE", "10"))
+PAGE_FETCH_WORKERS = 16
+
+class PageFetcher:
+    """Runs a page's fetches in parallel; each section waits only for the one it needs.
+
+    Inside `with fetcher.page(jobs, deadline):` every job (name -> fn) is already
+    running on a shared pool, and `result(name, fn)` waits for it until the page
+    deadline, raising TimeoutError when it is late (the job keeps going and warms
+    the caches for the next run). Outside a page run, e.g. when a fragment reruns
+    on its own, or for a name that is not a job, result() just calls fn().
+
+    The pool is shared by every session, so pages submit only real upstream misses
+    (see page_fetches); cache hits are read inline and never queue behind
+    another session's slow download.
+    """
+
+    def __init__(self, workers):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="page-fetch")
+        self._local = threading.local()  # The page run on this script thread
+
+    @contextmanager
+    def page(self, jobs, deadline):
+        diagnostics = get_diagnostics()
+        run_spans = diagnostics.run_spans()
+        def run(fn):
+            diagnostics.bind(run_spans)
+            return fn()
+
+        futures = {name: self._pool.submit(run, fn) for name, fn in jobs.items()}
+        self._local.page = (time.monotonic() + deadline, futures)
+        try:
+            yield
+        finally:
+            self._local.page = None
+
+    def result(self, name, fn):
+        page = getattr(self._local, "page", None)
+        if page is None or name not in page[1]:
+            return fn()
+        until, futures = page
+        try:
+            return futures[name].result(timeout=max(0, until - time.monotonic()))
+        except FutureTimeout:
+            raise TimeoutError(f"{name} missed the page deadline") from None
+
+@st.cache_resource(show_spinner=False)
+def get_page_fetcher():
+    return PageFetcher(PAGE_FETCH_WORKERS)
+
+#***********************
+# Google Sheet data
+google_sheets_url = "https://docs.google.com/spreadsheets/d/e/2PACX-1vTuyGRVZuafIk2s7moScIn5PAUcPYEyYIOOYJj54RXYUeugWmOP0iIToljSEMhHrg_Zp8Vab6YvBJDV/pub?output=csv"
+
+# Local folder for the persistent NAV history (and other derived data)
+DATA_DIR = os.environ.get("DASHBOARD_DATA_DIR", ".data")
+
+# Columns that make up the daily NAV time series
+HISTORY_COLUMNS = ['date', 'nav', 'day change %', 'nifty50 value', 'nifty50 change %', 'dd', 'dd_n50']
+
+# Snapshots published by refresher.py; used instead of live fetches while its heartbeat is recent
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+REFRESHER_TIMEOUT = float(os.environ.get("REFRESHER_TIMEOUT", "300"))
+
+# Seconds a downloaded sheet counts as fresh; older copies are served while a refresh runs
+SHEET_CACHE_TTL = float(os.environ.get("SHEET_CACHE_TTL", "60"))
+
+# Declared layout of the published sheet (column names after strip/lower-case).
+#   number  - plain numbers; thousands separators are handled by the CSV parser
+#   percent - numbers with a trailing '%' (stored without it)
+#   date    - parsed with SHEET_DATE_FORMAT
+#   text    - kept as strings
+SHEET_SCHEMA = {
+    "date": "date",
+    "nav": "number",
+    "day change": "number",
+    "day change %": "percent",
+    "nifty50 value": "number",
+    "current value": "number",
+    "nifty50 change %": "percent",
+    "dd": "percent",
+    "dd_n50": "percent",
+    "portfolio value": "number",
+    "absolute gain": "number",
+    "nifty50": "number",
+    "portfolio": "text",
+    "today change": "percent",
+}
+REQUIRED_COLUMNS = ["date", "nav", "portfolio", "today change"]
+MOVER_BLOCKS = {"gainers": [14, 15, 16], "losers": [18, 19, 20]}  # Columns O-Q and S-U: Symbol, CMP, Change%
+
+# Date format of the date column, e.g. "%d-%b-%Y". Unset, pandas infers it once from the first value
+SHEET_DATE_FORMAT = os.environ.get("SHEET_DATE_FORMAT") or None
+SHEET_NA_VALUES = ["#N/A", "#VALUE!", "#DIV/0!", "#REF!", "-"]
+
+@dataclass
+class SchemaReport:
+    """Differences between the sheet we received and SHEET_SCHEMA."""
+    missing: list = field(default_factory=list)       # required columns not in the sheet
+    renamed: dict = field(default_factory=dict)       # declared name -> column actually used
+    unparsed: dict = field(default_factory=dict)      # column -> non-empty cells that did not convert
+
+    def __bool__(self):
+        return bool(self.missing or self.renamed or self.unparsed)
+
+    def __str__(self):
+        parts = []
+        if self.missing:
+            parts.append(f"missing columns {self.missing}")
+        if self.renamed:
+            parts.append(f"renamed columns {self.renamed}")
+        if self.unparsed:
+            parts.append(f"unparseable cells {self.unparsed}")
+        return "; ".join(parts)
+
+def to_number(values):
+    """Numeric column; strings like '1,234.5' or '-2.3%' are converted in one vectorized pass."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    return pd.to_numeric(values.astype(str).str.replace(r'[%,]', '', regex=True), errors='coerce')
+
+def frame_version(frame):
+    """Short content hash of a DataFrame's values (the index is ignored)."""
+    hashed = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()[:16]
+
+class NavHistory:
+    """NAV history sorted by date; a date range resolves to a positional slice.
+
+    `select_range()` binary-searches the sorted dates and returns `frame.iloc[lo:hi]`,
+    which shares memory with the full history instead of copying every column.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.dates = frame['date'].to_numpy(dtype='datetime64[ns]')
+
+    def __len__(self):
+        return len(self.dates)
+
+    @cached_property
+    def version(self):
+        """Content hash of the history; changes whenever any date or value does."""
+        return frame_version(self.frame)
+
+    @property
+    def first_date(self):
+        return pd.Timestamp(self.dates[0]).date()
+
+    @property
+    def last_date(self):
+        return pd.Timestamp(self.dates[-1]).date()
+
+    def positions(self, start, end):
+        """(lo, hi) such that frame.iloc[lo:hi] covers start..end inclusive."""
+        lo = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+        hi = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), 'ns'), side='right')
+        return int(lo), int(hi)
+
+    def select_range(self, start, end):
+        lo, hi = self.positions(start, end)
+        return self.frame.iloc[lo:hi]
+
+@dataclass
+class SheetSnapshot:
+    """Everything the page needs from one download of the Google Sheet."""
+    data: pd.DataFrame          # Cleaned sheet with every column (positional blocks included)
+    history: pd.DataFrame       # NAV time series (HISTORY_COLUMNS), one row per date, oldest first
+    portfolio_value: float      # cell [0,0]
+    absolute_gain: float        # cell [0,1]
+    nifty50_value: float        # cell [0,2]
+    previous_value: float       # cell [4,0]
+    xirr_value: float           # cell [2,1]
+    top_10_gainers: pd.DataFrame
+    top_10_loosers: pd.DataFrame
+    portfolio_data: pd.DataFrame  # "Portfolio" / "Today Change" / "Size" for the heatmap
+    stock_list: list = field(default_factory=list)
+    schema_report: SchemaReport = field(default_factory=SchemaReport)
+
+    @cached_property
+    def nav_history(self):
+        return NavHistory(self.history)
+
+    @property
+    def day_change(self):
+        return self.portfolio_value - self.previous_value
+
+    @property
+    def day_change_percent(self):
+        return (self.day_change / self.previous_value * 100) if self.previous_value != 0 else 0
+
+def clean_sheet_data(raw):
+    """Applies SHEET_SCHEMA to the parsed CSV; returns (data, history, schema report)."""
+    data = raw.copy(deep=False)
+    data.columns = data.columns.str.strip().str.lower()  # Normalize column names
+    report = SchemaReport()
+
+    if 'date' not in data.columns:
+        date_col_candidates = [col for col in data.columns if 'date' in col]
+        if date_col_candidates:
+            data['date'] = data[date_col_candidates[0]]
+            report.renamed['date'] = date_col_candidates[0]
+
+    for col, kind in SHEET_SCHEMA.items():
+        if col not in data.columns:
+            if col in REQUIRED_COLUMNS:
+                report.missing.append(col)
+            continue
+        if kind == "text":
+            continue
+        values = data[col]
+        if kind == "date":
+            converted = pd.to_datetime(values, format=SHEET_DATE_FORMAT, errors='coerce')
+        else:
+            converted = to_number(values)
+        unparsed = int((converted.isna() & values.notna()).sum())
+        if unparsed:
+            report.unparsed[col] = unparsed
+        data[col] = converted
+
+    history = extract_history(data)  # Before filling blanks so rows without a date drop out
+    numeric_cols = [col for col, kind in SHEET_SCHEMA.items() if kind in ("number", "percent") and col in data.columns]
+    data[numeric_cols] = data[numeric_cols].fillna(0)
+    return data, history, report
+
+def extract_history(data):
+    """Daily NAV rows keyed by date, sorted oldest first."""
+    if 'date' not in data.columns:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    columns = [col for col in HISTORY_COLUMNS if col in data.columns]
+    history = data.loc[data['date'].notna(), columns]
+    history = history.drop_duplicates(subset='date', keep='last').sort_values('date')
+    # Sheets without the drawdown columns get them from the levels, in % like the sheet's own
+    for dd_col, level_col in (('dd', 'nav'), ('dd_n50', 'nifty50 value')):
+        if dd_col not in history.columns and level_col in history.columns:
+            history[dd_col] = percent_drawdown(history[level_col].to_numpy(dtype=float))
+    return history.fillna(0).reset_index(drop=True)
+
+def extract_movers(data, positions):
+    """Top 10 block (Symbol, CMP, Change%) from the given sheet column positions."""
+    if max(positions) >= data.shape[1]:
+        return pd.DataFrame({"Symbol": [], "CMP": [], "Change%": []})
+    movers = data.iloc[:, positions].head(10)
+    movers.columns = ["Symbol", "CMP", "Change%"]
+    movers = movers.dropna(subset=["Symbol"])
+    movers["Change%"] = to_number(movers["Change%"])
+    return movers
+
+def extract_portfolio_data(data):
+    """Portfolio holdings with today's change for the heatmap (first 30 stocks)."""
+    if "portfolio" not in data.columns or "today change" not in data.columns:
+        return pd.DataFrame()
+    df = data[["portfolio", "today change"]].dropna().head(30)  # Limit to the first 30 stocks
+    df.columns = ["Portfolio", "Today Change"]
+    df["Size"] = df["Today Change"].abs()  # Add column for box sizing
+    return df
+
+def parse_sheet_snapshot(raw):
+    """Builds a SheetSnapshot from the raw CSV frame (no network)."""
+    data, history, schema_report = clean_sheet_data(raw)
+
+    top_10_gainers = extract_movers(data, MOVER_BLOCKS["gainers"])
+    top_10_loosers = extract_movers(data, MOVER_BLOCKS["losers"])
+
+    if "portfolio" in data.columns:
+        full_stock_list = data["portfolio"].dropna().tolist()[:30]  # First 30 stock names
+    else:
+        full_stock_list = []
+
+    # Order: top 10 gainers -> middle stocks -> top 10 losers (highest losers at the bottom)
+    gainer_symbols = top_10_gainers["Symbol"].tolist()
+    looser_symbols = top_10_loosers["Symbol"].tolist()
+    middle_stocks = [stock for stock in full_stock_list if stock not in looser_symbols and stock not in gainer_symbols]
+    stock_list = gainer_symbols + middle_stocks + looser_symbols[::-1]
+
+    return SheetSnapshot(
+        data=data,
+        history=history,
+        **header_cells(data),
+        top_10_gainers=top_10_gainers,
+        top_10_loosers=top_10_loosers,
+        portfolio_data=extract_portfolio_data(data),
+        stock_list=stock_list,
+        schema_report=schema_report,
+    )
+
+# The account figures sit in the top-left block of the sheet (header row + 5 rows of columns A-C)
+HEADER_RANGE = "A1:C6"
+
+def header_cells(data):
+    """SheetSnapshot's account fields from the cleaned sheet (or just its header block)."""
+    cell = lambda row, col: pd.to_numeric(data.iloc[row, col], errors='coerce')
+    return {"portfolio_value": cell(0, 0), "absolute_gain": cell(0, 1), "nifty50_value": cell(0, 2),
+            "previous_value": cell(4, 0), "xirr_value": cell(2, 1)}
+
+def header_url(url):
+    """Published-CSV URL of only the header block (a few hundred bytes instead of the whole sheet)."""
+    return f"{url}{'&' if '?' in url else '?'}range={HEADER_RANGE}"
+
+def download_sheet(url, etag=None, last_modified=None, timeout=30):
+    """Conditional GET of the published CSV.
+
+    Returns (raw frame, etag, last_modified); the frame is None when the server
+    answered 304 Not Modified for the validators we sent.
+    """
+    content, etag, last_modified = download_sheet_bytes(url, etag, last_modified, timeout)
+    if content is None:
+        return None, etag, last_modified
+    return read_sheet_csv(content), etag, last_modified
+
+def read_sheet_csv(content):
+    """Parses the published CSV in one C-parser pass (thousands separators handled there)."""
+    return pd.read_csv(io.BytesIO(content), header=0, thousands=',', na_values=SHEET_NA_VALUES)
+
+def download_sheet_bytes(url, etag=None, last_modified=None, timeout=30):
+    """Like download_sheet() but returns the CSV bytes unparsed."""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    with span("http.sheet", conditional=bool(headers)) as record:
+        response = get_data_source().get_sheet(url, headers, timeout)
+        record["status"] = response.status_code
+        record["bytes"] = len(response.content)
+    if response.status_code == 304:
+        return None, etag, last_modified
+    return response.content, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+class HistoryStore:
+    """Local Parquet copy of the NAV history, keyed by date.
+
+    The file is memory-mapped on the first merge; after that each download only
+    merges the rows that are new or changed, and the file is rewritten only
+    when something actually changed. Rows that disappear upstream (truncated
+    or slow sheet) stay in the store. On a cold start SheetCache merges it with
+    the last good sheet copy, so the page does not wait for Google.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._history = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            return self._loaded()
+
+    def _loaded(self):
+        # Caller holds _lock
+        if self._history is None:
+            self._history = self._read()
+        return self._history
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        try:
+            return pq.read_table(self.path, memory_map=True).to_pandas()
+        except Exception:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)  # Unreadable file: rebuild from the sheet
+
+    def merge(self, fresh):
+        """Upserts `fresh` rows by date and returns the full merged history."""
+        with self._lock:
+            stored = self._loaded()  # Read under the lock, so concurrent merges build on each other
+            if stored.empty:
+                changed = fresh
+            else:
+                fresh_by_date = fresh.set_index('date')
+                stored_by_date = stored.set_index('date').reindex(columns=fresh_by_date.columns)
+                aligned = stored_by_date.reindex(fresh_by_date.index)
+                same = (fresh_by_date == aligned) | (fresh_by_date.isna() & aligned.isna())
+                changed = fresh[~same.all(axis=1).to_numpy()]
+            if changed.empty:
+                return stored
+
+            kept = stored[~stored['date'].isin(changed['date'])]
+            merged = pd.concat([kept, changed], ignore_index=True) if not kept.empty else changed.copy()
+            merged = merged.sort_values('date').reset_index(drop=True)
+            self._write(merged)
+            self._history = merged
+            return merged
+
+    def _write(self, history):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(pa.Table.from_pandas(history, preserve_index=False), tmp_path)
+        os.replace(tmp_path, self.path)  # Readers never see a half-written file
+
+def source_key(url):
+    """Short stable name for a sheet URL (used for file names)."""
+    return hashlib.sha1(url.encode()).hexdigest()[:12]
+
+class SnapshotStore:
+    """Versioned sheet and quote snapshots on local disk.
+
+    Writers (refresher.py, and SheetCache for its last-good copies) publish each
+    new payload under a content-addressed version and then swap manifest.json in
+    one rename; manifest updates within a process are serialized by a lock. The manifest also carries the refresher's
+    heartbeat, so readers can tell whether the published data is being kept
+    up to date.
+    """
+
+    def __init__(self, root, keep=20):
+        self.root = root
+        self.keep = keep
+        self._manifest = {}
+        self._manifest_mtime = None
+        self._parsed = {}  # (name, version) -> parsed payload
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Read-modify-write of the manifest
+
+    def manifest(self):
+        path = os.path.join(self.root, "manifest.json")
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return {}
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                try:
+                    with open(path) as f:
+                        self._manifest = json.load(f)
+                    self._manifest_mtime = mtime
+                except (OSError, ValueError):
+                    pass  # Keep the previous manifest
+            return self._manifest
+
+    def is_alive(self):
+        """True while the refresher has checked in within REFRESHER_TIMEOUT seconds."""
+        heartbeat = self.manifest().get("heartbeat_at")
+        return heartbeat is not None and time.time() - heartbeat < REFRESHER_TIMEOUT
+
+    def version(self, name):
+        entry = self.manifest().get("entries", {}).get(name)
+        return entry["version"] if entry else None
+
+    def status(self, name):
+        """(data_at, error) of `name`: when the writer last confirmed it, and why it is stale
+        (its last failure, or missing from the latest poll); error is None when healthy."""
+        manifest = self.manifest()
+        entry = manifest.get("entries", {}).get(name)
+        if not entry:
+            return None, None
+        data_at = entry.get("checked_at", entry["published_at"])
+        failure = manifest.get("failures", {}).get(name)
+        if failure:
+            return data_at, failure["error"]
+        last_poll = manifest.get("status", {}).get("last_poll")
+        if last_poll is not None and data_at < last_poll:
+            return data_at, "not refreshed by the last poll"
+        return data_at, None
+
+    def read(self, name, parse):
+        """(version, parse(bytes)) of the latest payload for `name`; parsed once per version."""
+        entry = self.manifest().get("entries", {}).get(name)
+        if not entry:
+            return None, None
+        key = (name, entry["version"])
+        with self._lock:
+            if key in self._parsed:
+                return entry["version"], self._parsed[key]
+        with open(os.path.join(self.root, name, entry["file"]), "rb") as f:
+            value = parse(f.read())
+        with self._lock:
+            self._parsed = {k: v for k, v in self._parsed.items() if k[0] != name}  # Drop older versions
+            self._parsed[key] = value
+        return entry["version"], value
+
+    # Writer side (refresher.py)
+    def publish(self, name, payload, suffix):
+        """Stores `payload` (bytes) if it differs from the latest version; returns the version.
+
+        Either way `name` counts as confirmed now and its last failure is cleared.
+        """
+        digest = hashlib.sha1(payload).hexdigest()[:16]
+        with self._write_lock:
+            manifest = self._read_manifest_for_write()
+            manifest["failures"].pop(name, None)
+            entry = manifest["entries"].get(name)
+            if entry and entry["digest"] == digest:
+                entry["checked_at"] = time.time()
+                self._write_manifest(manifest)
+                return entry["version"]
+
+            version = f"{int(time.time())}-{digest}"
+            folder = os.path.join(self.root, name)
+            os.makedirs(folder, exist_ok=True)
+            file_name = f"{version}.{suffix}"
+            self._atomic_write(os.path.join(folder, file_name), payload)
+            now = time.time()
+            manifest["entries"][name] = {"version": version, "file": file_name, "digest": digest,
+                                         "published_at": now, "checked_at": now}
+            self._write_manifest(manifest)
+            self._prune(folder)
+        return version
+
+    def confirm(self, name):
+        """Marks the latest version of `name` as still current (e.g. after a 304)."""
+        with self._write_lock:
+            manifest = self._read_manifest_for_write()
+            manifest["failures"].pop(name, None)
+            if name in manifest["entries"]:
+                manifest["entries"][name]["checked_at"] = time.time()
+            self._write_manifest(manifest)
+
+    def record_failure(self, name, error):
+        """Keeps the latest version of `name` published but marks it as failing to refresh."""
+        with self._write_lock:
+            manifest = self._read_manifest_for_write()
+            manifest["failures"][name] = {"error": error, "failed_at": time.time()}
+            self._write_manifest(manifest)
+
+    def heartbeat(self, **status):
+        with self._write_lock:
+            manifest = self._read_manifest_for_write()
+            manifest["heartbeat_at"] = time.time()
+            manifest["status"] = status
+            self._write_manifest(manifest)
+
+    def _read_manifest_for_write(self):
+        try:
+            with open(os.path.join(self.root, "manifest.json")) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        manifest.setdefault("entries", {})
+        manifest.setdefault("failures", {})
+        return manifest
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        self._atomic_write(os.path.join(self.root, "manifest.json"), json.dumps(manifest).encode())
+
+    def _atomic_write(self, path, payload):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # Unique per writer
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def _prune(self, folder):
+        files = sorted(f for f in os.listdir(folder) if not f.endswith(".tmp"))
+        for old in files[:-self.keep]:
+            os.remove(os.path.join(folder, old))
+
+class SheetCache:
+    """Process-wide TTL cache for the sheet with stale-while-revalidate.
+
+    Fresh entries are returned as is. Expired entries are returned immediately
+    while one background thread revalidates them with ETag/Last-Modified, so only
+    the very first viewer after a restart waits on Google.
+
+    Every downloaded sheet is also kept under <history_dir>/last_good. On a cold
+    start the page gets that copy (merged with the stored NAV history) right away
+    and a background thread revalidates it, so a slow or failing Google only
+    delays the fresh data, never the page.
+    """
+
+    def __init__(self, ttl, history_dir=None, snapshot_store=None, coordinator=None):
+        self.ttl = ttl
+        self.coordinator = coordinator or FetchCoordinator(FETCH_LIMITS)
+        self.history_dir = history_dir  # One HistoryStore per sheet URL in here
+        self._history_stores = {}
+        # Same layout as the refresher's store, but written by this cache
+        self.last_good = SnapshotStore(os.path.join(history_dir, "last_good"), keep=2) if history_dir else None
+        self.snapshot_store = snapshot_store
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "not_modified": 0, "downloads": 0, "errors": 0,
+                      "published": 0, "last_good": 0}
+        # url -> {"snapshot", "etag", "last_modified", "fetched_at", "data_at", "error"}; fetched_at drives
+        # the TTL, data_at is when the data was last confirmed and error is set while refreshes fail
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with span("sheet.get") as record:
+            if self.snapshot_store is not None and self.snapshot_store.is_alive():
+                snapshot = self.get_published(url)
+                if snapshot is not None:
+                    record["cache"] = "published"
+                    return snapshot
+            with self._lock:
+                entry = self._entries.get(url)
+                if entry is None:
+                    self.stats["misses"] += 1
+                    record["cache"] = "miss"
+                elif time.time() - entry["fetched_at"] < self.ttl:
+                    self.stats["hits"] += 1
+                    record["cache"] = "hit"
+                    return entry["snapshot"]
+                else:
+                    self.stats["stale_hits"] += 1
+                    record["cache"] = "stale"
+                    self._revalidate(url)
+                    return entry["snapshot"]
+            # Cold miss: sessions arriving together share one download
+            return self.coordinator.do("sheet", url, lambda: self._fill(url))
+
+    def get_published(self, url):
+        """Latest snapshot published by refresher.py for `url`, or None.
+
+        Sessions that see a new version together share one build of it.
+        """
+        name = f"sheet-{source_key(url)}"
+        version, raw = self.snapshot_store.read(name, read_sheet_csv)
+        if raw is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and entry.get("version") == version:
+                self.stats["hits"] += 1
+                return entry["snapshot"]
+        return self.coordinator.do("sheet", (url, version), lambda: self._load_published(url, version, raw))
+
+    def _load_published(self, url, version, raw):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and entry.get("version") == version:
+                return entry["snapshot"]  # Built by a call that finished while we queued
+            self.stats["published"] += 1
+        snapshot = self._build_snapshot(url, raw)
+        data_at, _ = self.snapshot_store.status(f"sheet-{source_key(url)}")
+        with self._lock:
+            self._entries[url] = {"snapshot": snapshot, "version": version, "fetched_at": time.time(),
+                                  "data_at": data_at}
+        return snapshot
+
+    def peek(self, url):
+        """Cached snapshot for `url`, or None. Never checks the TTL or refreshes."""
+        with self._lock:
+            entry = self._entries.get(url)
+        return entry["snapshot"] if entry is not None else None
+
+    def status(self, url):
+        """(data_at, error) of the cached entry: when its data was last confirmed, and the
+        last refresh error while it is being served stale (None when healthy). Entries
+        published by refresher.py report what the refresher recorded for them."""
+        with self._lock:
+            entry = self._entries.get(url, {})
+        if entry.get("version") is not None and self.snapshot_store is not None:
+            return self.snapshot_store.status(f"sheet-{source_key(url)}")
+        return entry.get("data_at"), entry.get("error")
+
+    def history_store(self, url):
+        """The NAV history store for `url` (None when history is not persisted)."""
+        if self.history_dir is None:
+            return None
+        with self._lock:
+            if url not in self._history_stores:
+                # The original single-sheet deployment kept its history in nav_history.parquet
+                name = "nav_history" if url == google_sheets_url else f"nav_history-{source_key(url)}"
+                self._history_stores[url] = HistoryStore(os.path.join(self.history_dir, f"{name}.parquet"))
+            return self._history_stores[url]
+
+    def _build_snapshot(self, url, raw):
+        snapshot = parse_sheet_snapshot(raw)
+        history_store = self.history_store(url)
+        if history_store is not None:
+            snapshot.history = history_store.merge(snapshot.history)
+        return snapshot
+
+    def _fill(self, url):
+        """Cold miss: the last good copy from disk, revalidated in the background;
+        without one, a single download attempt.
+
+        Skips all of it when a fetch that finished while we queued already
+        filled the entry. Never sleeps; retries happen in the background.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is not None:
+            return entry["snapshot"]
+        snapshot = self._load_last_good(url)
+        if snapshot is not None:
+            with self._lock:
+                self._revalidate(url)
+            return snapshot
+        return self._refresh(url, retries=1)
+
+    def refresh(self, url, retries=3):
+        """Revalidates/downloads the sheet now, retrying with backoff; returns the snapshot or None.
+
+        Concurrent calls for the same URL share one download. Sleeps between
+        attempts, so page runs only call it with retries=1.
+        """
+        return self.coordinator.do("sheet", url, lambda: self._refresh(url, retries))
+
+    def _refresh(self, url, retries=3):
+        with self._lock:
+            entry = self._entries.get(url, {})
+        with span("sheet.refresh", result="failed") as record:
+            for attempt in range(retries):
+                if attempt:
+                    time.sleep(backoff_delay(attempt - 1))
+                record["attempts"] = attempt + 1
+                try:
+                    content, etag, last_modified = download_sheet_bytes(url, entry.get("etag"),
+                                                                        entry.get("last_modified"))
+                    if content is None:
+                        self.stats["not_modified"] += 1
+                        record["result"] = "not_modified"
+                        snapshot = entry["snapshot"]
+                    else:
+                        self.stats["downloads"] += 1
+                        record["result"] = "downloaded"
+                        raw = read_sheet_csv(content)
+                        with span("sheet.parse", rows=len(raw)):
+                            snapshot = self._build_snapshot(url, raw)
+                    with self._lock:
+                        self._entries[url] = {"snapshot": snapshot, "etag": etag, "last_modified": last_modified,
+                                              "fetched_at": time.time(), "data_at": time.time()}
+                    if content is not None:
+                        self._save_last_good(url, content)
+                    return snapshot  # Fresh data successfully fetched
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    record["error_detail"] = f"{type(e).__name__}: {e}"
+                    if isinstance(e, CircuitOpenError):
+                        break  # Retrying now would fail fast again
+        with self._lock:
+            if url in self._entries:
+                self._entries[url]["error"] = record["error_detail"]
+        return entry.get("snapshot")
+
+    def _save_last_good(self, url, content):
+        """Keeps the downloaded CSV for _load_last_good(); a failed write never costs the download."""
+        if self.last_good is None:
+            return
+        try:
+            with span("sheet.save_last_good"):
+                self.last_good.publish(f"sheet-{source_key(url)}", content, "csv")
+        except OSError:
+            pass  # Recorded as the span's error
+
+    def _load_last_good(self, url):
+        """The last sheet this cache downloaded for `url` (kept on disk), entered as expired."""
+        if self.last_good is None:
+            return None
+        name = f"sheet-{source_key(url)}"
+        try:
+            _, raw = self.last_good.read(name, read_sheet_csv)
+        except (OSError, ValueError):
+            raw = None
+        if raw is None:
+            return None
+        self.stats["last_good"] += 1
+        snapshot = self._build_snapshot(url, raw)
+        saved_at = self.last_good.manifest()["entries"][name]["published_at"]
+        with self._lock:
+            # fetched_at 0: expired, so it is revalidated until a download succeeds
+            self._entries[url] = {"snapshot": snapshot, "fetched_at": 0, "data_at": saved_at,
+                                  "error": "loading the latest Google Sheet"}
+        return snapshot
+
+    def _revalidate(self, url):
+        # Caller holds _lock
+        if url not in self._refreshing:
+            self._refreshing.add(url)
+            threading.Thread(target=self._refresh_in_background, args=(url,), daemon=True).start()
+
+    def _refresh_in_background(self, url):
+        try:
+            # Own key: a cold-miss _fill() may still be in flight under "sheet", url
+            self.coordinator.do("sheet", (url, "revalidate"), lambda: self._refresh(url))
+        finally:
+            with self._lock:
+                self._refreshing.discard(url)
+
+# One cache per server process, shared by every session
+@st.cache_resource(show_spinner=False)
+def get_snapshot_store():
+    return SnapshotStore(SNAPSHOT_DIR)
+
+@st.cache_resource(show_spinner=False)
+def get_sheet_cache():
+    return SheetCache(ttl=SHEET_CACHE_TTL, history_dir=DATA_DIR, snapshot_store=get_snapshot_store(),
+                      coordinator=get_fetch_coordinator())
+
+#***********************
+# Strategy registry
+# Strategies the dashboard can show: a JSON file (DASHBOARD_STRATEGIES, default strategies.json)
+# mapping strategy name -> published sheet CSV URL, e.g. {"Momentum 30": "https://...output=csv"}.
+# Without the file the dashboard shows the single sheet above. All strategies share one sheet
+# cache, history folder and refresher, so adding one costs a sheet download, not a deployment.
+STRATEGIES_FILE = os.environ.get("DASHBOARD_STRATEGIES", "strategies.json")
+DEFAULT_STRATEGY = "Strategy"
+STRATEGY_WORKERS = int(os.environ.get("STRATEGY_WORKERS", "8"))  # Concurrent cold sheet downloads
+STRATEGY_DEADLINE = 20  # Seconds to wait for a batch of strategies; late ones are left out
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_strategies():
+    """Registered strategies in file order."""
+    try:
+        with open(STRATEGIES_FILE) as f:
+            strategies = json.load(f)
+    except FileNotFoundError:
+        return {DEFAULT_STRATEGY: google_sheets_url}
+    if not isinstance(strategies, dict) or not strategies:
+        raise ValueError(f"{STRATEGIES_FILE} must map strategy names to sheet URLs")
+    return strategies
+
+def selected_strategy():
+    """(name, url) of the strategy picked in the sidebar, else the first registered one."""
+    strategies = load_strategies()
+    name = st.session_state.get("strategy")
+    if name not in strategies:
+        name = next(iter(strategies))
+    return name, strategies[name]
+
+def fetch_strategy_snapshots(names, deadline=STRATEGY_DEADLINE):
+    """Snapshots for several strategies, loaded concurrently through the shared sheet cache.
+
+    Warm strategies come straight from the cache; cold ones download in parallel, so the
+    wait is set by the slowest batch rather than the number of strategies. Strategies that
+    fail or miss the deadline are absent from the result.
+    """
+    strategies = load_strategies()
+    cache = get_sheet_cache()
+    diagnostics, run_spans = get_diagnostics(), get_diagnostics().run_spans()
+    def load(name):
+        diagnostics.bind(run_spans)
+        return cache.get(strategies[name])
+
+    snapshots = {}
+    with span("strategies.fetch", strategies=len(names)) as record:
+        executor = ThreadPoolExecutor(max_workers=max(1, min(STRATEGY_WORKERS, len(names))))
+        futures = {executor.submit(load, name): name for name in names if name in strategies}
+        done, _ = wait(futures, timeout=deadline)
+        for future in done:
+            try:
+                snapshot = future.result()
+            except Exception:
+                continue
+            if snapshot is not None:
+                snapshots[futures[future]] = snapshot
+        executor.shutdown(wait=False, cancel_futures=True)
+        record["loaded"] = len(snapshots)
+    return {name: snapshots[name] for name in names if name in snapshots}
+
+#***********************
+# NSE trading calendar
+IST = pytz.timezone('Asia/Kolkata')  # India Standard Time (IST)
+MARKET_OPEN = datetime.time(9, 15)
+MARKET_CLOSE = datetime.time(15, 30)
+
+# NSE trading holidays (weekdays only) from the exchange's yearly circulars; extend every December.
+# Extra dates can be added without a deploy through NSE_EXTRA_HOLIDAYS="2026-01-15,2026-03-03".
+NSE_HOLIDAYS = {date.fromisoformat(d) for d in [
+    # 2024
+    "2024-01-22", "2024-01-26", "2024-03-08", "2024-03-25", "2024-03-29", "2024-04-11", "2024-04-17",
+    "2024-05-01", "2024-05-20", "2024-06-17", "2024-07-17", "2024-08-15", "2024-10-02", "2024-11-01",
+    "2024-11-15", "2024-11-20", "2024-12-25",
+    # 2025
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14", "2025-04-18", "2025-05-01",
+    "2025-08-15", "2025-08-27", "2025-10-02", "2025-10-21", "2025-10-22", "2025-11-05", "2025-12-25",
+    # 2026
+    "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31", "2026-04-03", "2026-04-14", "2026-05-01",
+    "2026-05-28", "2026-06-26", "2026-09-14", "2026-10-02", "2026-10-20", "2026-11-10", "2026-11-24",
+    "2026-12-25",
+]}
+NSE_HOLIDAYS |= {date.fromisoformat(d.strip()) for d in os.environ.get("NSE_EXTRA_HOLIDAYS", "").split(",") if d.strip()}
+
+def is_trading_day(day):
+    return day.weekday() < 5 and day not in NSE_HOLIDAYS
+
+def previous_trading_day(day):
+    """Last NSE trading day strictly before `day`."""
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+def now_ist():
+    return datetime.datetime.now(IST)
+
+def current_session(now=None):
+    """Date of the latest NSE session that has started (today once the market opens)."""
+    now = now or now_ist()
+    if is_trading_day(now.date()) and now.time() >= MARKET_OPEN:
+        return now.date()
+    return previous_trading_day(now.date())
+
+def is_market_open(now=None):
+    now = now or now_ist()
+    return is_trading_day(now.date()) and MARKET_OPEN <= now.time() <= MARKET_CLOSE
+
+#***********************
+# Live quotes from Yahoo Finance
+
+# Indices shown in the Broader Indices table
+INDICES = {
+    "NIFTY 50": "^NSEI",
+    "NIFTY BANK": "^NSEBANK",
+    "NIFTY NEXT 50": "^NSMIDCP",
+    "NIFTY 500": "^CRSLDX",
+    "NIFTY TOTAL MKT": "NIFTY_TOTAL_MKT.NS",
+    "N200MOMENTM30": "NIFTY200MOMENTM30.NS",
+    "NIFTY ALPHA 50": "NIFTYALPHA50.NS",
+    "MIDCAP 100": "NIFTY_MIDCAP_100.NS",
+    "SMLCAP 100": "^CNXSC",
+    "NIFTY MICROCAP250": "NIFTY_MICROCAP250.NS",
+    "INDIA VIX": "^INDIAVIX",
+    "Dow Jones": "^DJI",
+}
+
+QUOTE_TIMEOUT = 5      # seconds allowed for a single ticker / the batched download
+QUOTE_DEADLINE = 8     # seconds allowed for the whole quote fetch
+QUOTE_WORKERS = 6      # threads used for per-ticker fallback lookups
+QUOTE_CACHE_TTL = 60   # seconds a fetched set of quotes is shared across sessions
+QUOTE_RETRIES = 3      # background attempts for tickers Yahoo did not answer (backoff_delay in between)
+
+NIFTY_TICKER = "^NSEI"
+
+@dataclass
+class Quote:
+    ticker: str
+    price: float
+    previous_close: float
+    closes: pd.Series = None  # Recent daily closes (only from the batched download)
+    as_of: float = None       # time.time() when Yahoo returned it
+
+    @property
+    def change_percent(self):
+        if not self.previous_close:
+            return None
+        return (self.price - self.previous_close) / self.previous_close * 100
+
+def fetch_quotes_batch(tickers, timeout=QUOTE_TIMEOUT):
+    """Last price and previous close for all tickers from one yf.download call."""
+    source = get_data_source()
+    with span("yahoo.download", tickers=len(tickers)):
+        hist = get_fetch_coordinator().do("yahoo", ("download", tuple(tickers)),
+                                          lambda: source.download_quotes(tickers, timeout))
+    quotes = {}
+    if hist is None or hist.empty:
+        return quotes
+    for ticker in tickers:
+        try:
+            frame = hist[ticker] if isinstance(hist.columns, pd.MultiIndex) else hist
+            closes = frame["Close"].dropna()
+        except KeyError:
+            continue
+        if len(closes) >= 2:
+            quotes[ticker] = Quote(ticker, float(closes.iloc[-1]), float(closes.iloc[-2]), closes, time.time())
+    return quotes
+
+def fetch_quote_info(ticker):
+    """Single ticker lookup through Ticker.info (slow path)."""
+    source, coordinator = get_data_source(), get_fetch_coordinator()
+    with span("yahoo.info", ticker=ticker):
+        info = coordinator.do("yahoo", ("info", ticker), lambda: source.ticker_info(ticker))
+
+    # Get Live CMP with fallback
+    cmp = info.get("regularMarketPrice")  # Live CMP
+    if cmp is None:
+        with span("yahoo.history", ticker=ticker):
+            hist = coordinator.do("yahoo", ("history", ticker), lambda: source.ticker_history(ticker, "1d"))
+        cmp = hist['Close'].iloc[-1] if not hist.empty else None  # Use last close if live price is missing
+    prev_close = info.get("regularMarketPreviousClose", cmp)  # Use CMP if previous close is missing
+    if cmp is None or prev_close is None:
+        return None
+    return Quote(ticker, float(cmp), float(prev_close), as_of=time.time())
+
+def fetch_quotes(tickers, deadline=QUOTE_DEADLINE):
+    """Quotes for all tickers within `deadline` seconds; missing tickers are simply absent.
+
+    Tries one batched download first and looks up whatever it did not return in a
+    bounded thread pool. Lookups still running at the deadline are abandoned.
+    """
+    started = time.monotonic()
+    try:
+        quotes = fetch_quotes_batch(tickers)
+    except Exception:
+        quotes = {}
+
+    missing = [ticker for ticker in tickers if ticker not in quotes]
+    remaining = deadline - (time.monotonic() - started)
+    if not missing or remaining <= 0:
+        return quotes
+
+    # Lookups report their spans into the calling page run
+    diagnostics, run_spans = get_diagnostics(), get_diagnostics().run_spans()
+    def lookup(ticker):
+        diagnostics.bind(run_spans)
+        return fetch_quote_info(ticker)
+
+    executor = ThreadPoolExecutor(max_workers=min(QUOTE_WORKERS, len(missing)))
+    futures = {executor.submit(lookup, ticker): ticker for ticker in missing}
+    done, _ = wait(futures, timeout=min(remaining, QUOTE_TIMEOUT))
+    for future in done:
+        try:
+            quote = future.result()
+        except Exception:
+            continue
+        if quote is not None:
+            quotes[futures[future]] = quote
+    executor.shutdown(wait=False, cancel_futures=True)
+    return quotes
+
+def fetch_quotes_with_backoff(tickers, retries=QUOTE_RETRIES):
+    """fetch_quotes() again for whatever is still missing, up to `retries` attempts with
+    backoff_delay() sleeps in between. Sleeps, so only background threads call it."""
+    quotes = {}
+    missing = list(tickers)
+    for attempt in range(retries):
+        if attempt:
+            time.sleep(backoff_delay(attempt - 1))
+        quotes.update(fetch_quotes(missing))
+        missing = [ticker for ticker in missing if ticker not in quotes]
+        if not missing:
+            break
+    return quotes
+
+def quotes_to_json(quotes):
+    payload = {}
+    for ticker, quote in quotes.items():
+        closes = None
+        if quote.closes is not None:
+            closes = {"dates": [ts.isoformat() for ts in quote.closes.index], "values": quote.closes.tolist()}
+        payload[ticker] = {"price": quote.price, "previous_close": quote.previous_close, "closes": closes,
+                           "as_of": quote.as_of}
+    return json.dumps(payload).encode()
+
+def quotes_from_json(content):
+    quotes = {}
+    for ticker, item in json.loads(content).items():
+        closes = None
+        if item["closes"] is not None:
+            closes = pd.Series(item["closes"]["values"], index=pd.to_datetime(item["closes"]["dates"]))
+        quotes[ticker] = Quote(ticker, item["price"], item["previous_close"], closes, item.get("as_of"))
+    return quotes
+
+@dataclass
+class NiftyQuote:
+    """NIFTY50 numbers used by the header metric and the indices table."""
+    session: date           # latest NSE session that has started
+    live_price: float       # latest price (the running daily close while the market is open)
+    last_close: float       # close of the latest completed session
+    previous_close: float   # close of the session before `session`
+
+    @property
+    def change_percent(self):
+        if not self.previous_close:
+            return 0
+        return (self.live_price - self.previous_close) / self.previous_close * 100
+
+def build_nifty_quote(quote, now=None):
+    """NiftyQuote from the shared ^NSEI quote, using the NSE calendar to pick the reference close."""
+    now = now or now_ist()
+    session = current_session(now)
+    if quote is None:
+        return NiftyQuote(session, 0, 0, 0)
+    if quote.closes is None or quote.closes.empty:
+        return NiftyQuote(session, quote.price, quote.previous_close, quote.previous_close)
+
+    closes = quote.closes
+    bar_dates = pd.Index([ts.date() for ts in closes.index])
+    reference = closes[bar_dates <= previous_trading_day(session)]
+    completed = closes[bar_dates < now.date()] if is_market_open(now) else closes
+    previous_close = reference.iloc[-1] if not reference.empty else quote.previous_close
+    last_close = completed.iloc[-1] if not completed.empty else previous_close
+    return NiftyQuote(session, float(closes.iloc[-1]), float(last_close), float(previous_close))
+
+#***********************
+# Performance analytics
+
+# Return horizons: label -> how far back the window starts from the latest date
+PERFORMANCE_HORIZONS = {
+    "Inception": None,
+    "YTD": "ytd",
+    "1Y": pd.DateOffset(years=1),
+    "6M": pd.DateOffset(months=6),
+    "3M": pd.DateOffset(months=3),
+    "1M": pd.DateOffset(months=1),
+    "1W": pd.DateOffset(weeks=1),
+    "1D": "1d",
+}
+
+def compute_performance_table(history):
+    """Return and CAGR (in %) of the strategy and NIFTY50 for every horizon.
+
+    `history` must be sorted by date. Window starts are found with one binary
+    search over the dates, and all returns are computed as arrays, so the cost
+    does not depend on how many rows each window covers. CAGR is shown for
+    horizons of a year or more, judged by the horizon itself rather than by the
+    row the window happens to start on (Inception from the first date).
+    """
+    dates = history['date'].to_numpy()
+    n = len(dates)
+    if n == 0:
+        return pd.DataFrame(index=list(PERFORMANCE_HORIZONS),
+                            columns=["Strategy", "Nifty50", "Strategy CAGR", "Nifty50 CAGR"], dtype=float)
+
+    latest = pd.Timestamp(dates[-1])
+    targets = []
+    for offset in PERFORMANCE_HORIZONS.values():
+        if isinstance(offset, pd.DateOffset):
+            targets.append(latest - offset)
+        elif offset == "ytd":
+            targets.append(pd.Timestamp(latest.year - 1, 12, 31))  # Measured from the last close of last year
+        else:
+            targets.append(pd.Timestamp(dates[0]))  # Inception (1D is set below)
+    start = np.searchsorted(dates, np.array(targets, dtype='datetime64[ns]'), side='left')
+    start = np.minimum(start, n - 1)
+    if "1D" in PERFORMANCE_HORIZONS:
+        start[list(PERFORMANCE_HORIZONS).index("1D")] = max(n - 2, 0)
+    if "YTD" in PERFORMANCE_HORIZONS:
+        ytd = list(PERFORMANCE_HORIZONS).index("YTD")
+        # Start from the last row of the previous year when we have it
+        if start[ytd] > 0 and dates[start[ytd]] > np.datetime64(targets[ytd]):
+            start[ytd] -= 1
+
+    days = (dates[-1] - dates[start]) / np.timedelta64(1, 'D')
+    years = days / 365.25
+    # Length of each horizon, blank when the history does not reach back that far
+    targets = pd.DatetimeIndex(targets)
+    horizon_days = np.where(targets >= dates[0], (latest - targets).days, np.nan)
+    if "1D" in PERFORMANCE_HORIZONS:
+        horizon_days[list(PERFORMANCE_HORIZONS).index("1D")] = 1
+    table = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, col in (("Strategy", 'nav'), ("Nifty50", 'nifty50 value')):
+            values = history[col].to_numpy(dtype=float) if col in history.columns else np.full(n, np.nan)
+            growth = values[-1] / values[start]
+            growth[~np.isfinite(growth) | (values[start] <= 0)] = np.nan
+            if "1D" in PERFORMANCE_HORIZONS and n < 2:
+                growth[list(PERFORMANCE_HORIZONS).index("1D")] = np.nan  # No previous day to compare with
+            table[name] = (growth - 1) * 100
+            table[f"{name} CAGR"] = np.where(horizon_days >= 365, (growth ** (1 / np.where(years > 0, years, 1)) - 1) * 100, np.nan)
+    return pd.DataFrame(table, index=list(PERFORMANCE_HORIZONS))[["Strategy", "Nifty50", "Strategy CAGR", "Nifty50 CAGR"]]
+
+def calendar_returns(history, column):
+    """Returns (%) by year (rows) and month (Jan..Dec), plus YTD, from one month-end resample.
+
+    Each month is measured from the previous month's last level (the first month
+    from the first row), YTD from the previous year's last level. Months without
+    rows are blank.
+    """
+    months = [pd.Timestamp(2000, m, 1).strftime('%b') for m in range(1, 13)]
+    if column not in history.columns or history.empty:
+        return pd.DataFrame(columns=months + ["YTD"], dtype=float)
+    levels = history.set_index('date')[column]
+    levels = levels[levels > 0]
+    if levels.empty:
+        return pd.DataFrame(columns=months + ["YTD"], dtype=float)
+
+    month_end = levels.resample('ME').last()
+    filled = month_end.ffill()
+    monthly = filled / filled.shift(1, fill_value=levels.iloc[0]) - 1
+    monthly[month_end.isna()] = np.nan
+    year_end = filled.groupby(filled.index.year).last()
+    yearly = year_end / year_end.shift(1, fill_value=levels.iloc[0]) - 1
+
+    table = (monthly * 100).groupby([monthly.index.year, monthly.index.month]).first().unstack()
+    table = table.reindex(columns=range(1, 13))
+    table.columns = months
+    table["YTD"] = yearly * 100
+    table.index.name = None
+    return table
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_calendar_returns(version, column, _history):
+    """calendar_returns() once per data version; `_history` is not hashed, the version stands for it."""
+    return calendar_returns(_history, column)
+
+#***********************
+# Rolling risk
+
+# Windows in trading days (rows of the NAV history); change with RISK_WINDOWS="21,63,252"
+RISK_WINDOWS = tuple(int(w) for w in os.environ.get("RISK_WINDOWS", "21,63,252").split(","))
+RISK_FREE_RATE = float(os.environ.get("RISK_FREE_RATE", "0.065"))  # Annual, for Sharpe and Sortino
+TRADING_DAYS = 252
+RISK_COLUMNS = ["Return", "Volatility", "Nifty50 Volatility", "Sharpe", "Sortino", "Beta", "Correlation"]
+
+def carry_levels(values, last=np.nan):
+    """`values` with zero/blank levels replaced by the last positive one before them (`last` seeds the start)."""
+    levels = pd.Series(np.concatenate([[last], np.where(values > 0, values, np.nan)]))
+    return levels.ffill().to_numpy()[1:]
+
+class RollingRisk:
+    """Rolling return, volatility, Sharpe, Sortino, beta and correlation vs NIFTY50.
+
+    Keeps prefix sums of the daily returns r (strategy) and m (NIFTY50) and of
+    r², m², r·m and the squared downside, so every window statistic is a
+    difference of two prefix sums: O(1) per day and window, linear overall.
+    r and m are shifted by a constant (their mean when the engine was built)
+    before summing, which keeps the variance sums from cancelling out.
+
+    update() with a history that still starts with the rows seen so far only
+    processes the new rows; any change to older rows rebuilds from scratch.
+    Zero or blank levels (blank sheet cells arrive as 0) carry the last positive
+    level, so they count as flat days and the next row gets the whole move.
+    """
+
+    def __init__(self, windows=RISK_WINDOWS, risk_free=RISK_FREE_RATE):
+        self.windows = tuple(windows)
+        self.rf_daily = risk_free / TRADING_DAYS
+        self._reset()
+
+    def _reset(self):
+        self.dates = np.empty(0, dtype='datetime64[ns]')
+        self.nav = np.empty(0)
+        self.bench = np.empty(0)
+        self._levels = (np.empty(0), np.empty(0))  # nav and bench with blanks carried forward
+        self.shift = None
+        self._sums = np.zeros((1, 6))  # Row k: sums over returns 1..k (row 0 has no return)
+        self._metrics = {w: np.empty((0, len(RISK_COLUMNS))) for w in self.windows}
+        self.frames = {w: pd.DataFrame(columns=["date"] + RISK_COLUMNS) for w in self.windows}
+
+    def snapshot(self):
+        """{window: DataFrame of date + RISK_COLUMNS}."""
+        return self.frames
+
+    def update(self, history):
+        """Brings the engine up to `history` (sorted by date); returns True if anything changed."""
+        dates = history['date'].to_numpy(dtype='datetime64[ns]')
+        nav = history['nav'].to_numpy(dtype=float)
+        bench = history['nifty50 value'].to_numpy(dtype=float) if 'nifty50 value' in history.columns else np.full(len(nav), np.nan)
+        n_old = len(self.dates)
+        if (len(dates) < n_old or not np.array_equal(dates[:n_old], self.dates)
+                or not np.array_equal(nav[:n_old], self.nav, equal_nan=True)
+                or not np.array_equal(bench[:n_old], self.bench, equal_nan=True)):
+            self._reset()
+            n_old = 0
+        if len(dates) == n_old:
+            return False
+        self._extend(dates, nav, bench, n_old)
+        return True
+
+    def _extend(self, dates, nav, bench, n_old):
+        self.dates, self.nav, self.bench = dates, nav, bench
+        n = len(dates)
+        self._levels = tuple(np.concatenate([old, carry_levels(new[n_old:], old[-1] if n_old else np.nan)])
+                             for old, new in zip(self._levels, (nav, bench)))
+        nav_level, bench_level = self._levels
+        start = max(n_old, 1)  # First row whose return is new
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = nav_level[start:] / nav_level[start - 1:-1] - 1
+            m = bench_level[start:] / bench_level[start - 1:-1] - 1
+        r[~np.isfinite(r)] = 0.0
+        m[~np.isfinite(m)] = 0.0
+        if self.shift is None and len(r):
+            self.shift = (r.mean(), m.mean())
+        shift_r, shift_m = self.shift if self.shift is not None else (0.0, 0.0)
+        rc, mc = r - shift_r, m - shift_m
+        downside = np.minimum(r - self.rf_daily, 0.0)
+        terms = np.column_stack([rc, mc, rc * rc, mc * mc, rc * mc, downside * downside])
+        self._sums = np.vstack([self._sums, self._sums[-1] + np.cumsum(terms, axis=0)])
+
+        rows = np.arange(n_old, n)
+        for w in self.windows:
+            new = self._window_metrics(rows, w)
+            self._metrics[w] = np.vstack([self._metrics[w], new])
+            frame = pd.DataFrame(self._metrics[w], columns=RISK_COLUMNS)
+            frame.insert(0, "date", self.dates)
+            self.frames[w] = frame
+
+    def _window_metrics(self, rows, w):
+        """Metrics for windows of `w` returns ending at each of `rows` (NaN until w returns exist)."""
+        out = np.full((len(rows), len(RISK_COLUMNS)), np.nan)
+        valid = rows >= w
+        t = rows[valid]
+        if len(t) == 0 or w < 2:
+            return out
+        shift_r, _ = self.shift
+        sr, sm, srr, smm, srm, sdd = (self._sums[t] - self._sums[t - w]).T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var_r = np.maximum(srr - sr * sr / w, 0) / (w - 1)
+            var_m = np.maximum(smm - sm * sm / w, 0) / (w - 1)
+            cov = (srm - sr * sm / w) / (w - 1)
+            excess = sr / w + shift_r - self.rf_daily
+            sd_r, sd_m = np.sqrt(var_r), np.sqrt(var_m)
+            out[valid] = np.column_stack([
+                (self._levels[0][t] / self._levels[0][t - w] - 1) * 100,
+                sd_r * np.sqrt(TRADING_DAYS) * 100,
+                sd_m * np.sqrt(TRADING_DAYS) * 100,
+                excess / sd_r * np.sqrt(TRADING_DAYS),
+                excess / np.sqrt(sdd / w) * np.sqrt(TRADING_DAYS),
+                cov / var_m,
+                cov / (sd_r * sd_m),
+            ])
+        out[~np.isfinite(out)] = np.nan
+        return out
+
+class EngineCache:
+    """One incremental engine per (sheet, args), shared by every session.
+
+    Engines have update(history) -> changed and snapshot(); each call brings the
+    engine up to the given history (normally just the newly appended days).
+    """
+
+    def __init__(self, factory, name):
+        self.factory = factory
+        self.name = name
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, history, *args):
+        with self._lock:
+            engine = self._engines.get((key, args))
+            if engine is None:
+                engine = self._engines[(key, args)] = self.factory(*args)
+            with span(f"{self.name}.update", rows=len(history)) as record:
+                record["changed"] = engine.update(history)
+            return engine.snapshot()
+
+@st.cache_resource
+def get_risk_engines():
+    return EngineCache(RollingRisk, "risk")
+
+#***********************
+# Drawdowns
+
+def percent_drawdown(values):
+    """% below the running peak (0 at a new high); blank or zero levels carry the last value."""
+    values = pd.Series(np.where(values > 0, values, np.nan)).ffill().to_numpy()
+    with np.errstate(invalid='ignore'):
+        drawdown = (values / np.fmax.accumulate(values) - 1) * 100
+    return np.nan_to_num(drawdown, nan=0.0)
+
+def drawdown_episodes(values):
+    """Every drawdown in `values`, found in one vectorized O(n) pass.
+
+    Returns position arrays (start, trough, recovery) and depth in %: start is the
+    peak row the drawdown falls from, recovery the first row back at that peak
+    (-1 while still under water) and depth the drawdown at the trough.
+    """
+    drawdown = percent_drawdown(values)
+    under = drawdown < 0
+    edges = np.diff(under.astype(np.int8), prepend=0, append=0)
+    begins = np.flatnonzero(edges == 1)  # First row under water
+    ends = np.flatnonzero(edges == -1)   # First row back at the peak (len(values) if never)
+    if len(begins) == 0:
+        empty = np.empty(0, dtype=int)
+        return empty, empty, empty, np.empty(0)
+    # Rows between episodes are at 0, so a segment minimum is its episode's trough
+    depth = np.minimum.reduceat(drawdown, begins)
+    episode = np.cumsum(edges[:-1] == 1) - 1
+    at_trough = np.flatnonzero(under & (drawdown == depth[episode]))
+    _, first = np.unique(episode[at_trough], return_index=True)
+    recovery = np.where(ends < len(values), ends, -1)
+    return begins - 1, at_trough[first], recovery, depth
+
+class DrawdownEpisodes:
+    """Drawdown episode table for one column of the NAV history, extended incrementally.
+
+    Episodes that have recovered can no longer change, so an update only rescans
+    from the peak of the episode still open (or from the last row), which keeps
+    appending a day O(length of the current drawdown).
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self._reset()
+
+    def _reset(self):
+        self.dates = np.empty(0, dtype='datetime64[ns]')
+        self.values = np.empty(0)
+        empty = np.empty(0, dtype=int)
+        self._closed = (empty, empty, empty, np.empty(0))  # (start, trough, recovery, depth) of recovered episodes
+        self._resume = 0  # A row at the running peak; nothing before it can change
+        self.table = self._episode_table(*self._closed)
+
+    def snapshot(self):
+        """Episodes oldest first; an ongoing drawdown has no Recovery."""
+        return self.table
+
+    def update(self, history):
+        dates = history['date'].to_numpy(dtype='datetime64[ns]')
+        values = history[self.column].to_numpy(dtype=float) if self.column in history.columns else np.full(len(dates), np.nan)
+        n_old = len(self.dates)
+        if (len(dates) < n_old or not np.array_equal(dates[:n_old], self.dates)
+                or not np.array_equal(values[:n_old], self.values, equal_nan=True)):
+            self._reset()
+        elif len(dates) == n_old:
+            return False
+        self.dates, self.values = dates, values
+        if len(dates) == 0:
+            return True
+
+        offset = self._resume
+        start, trough, recovery, depth = drawdown_episodes(values[offset:])
+        start, trough = start + offset, trough + offset
+        closed = recovery >= 0
+        recovery = np.where(closed, recovery + offset, -1)
+        new = (start, trough, recovery, depth)
+        self._closed = tuple(np.concatenate([old, part[closed]]) for old, part in zip(self._closed, new))
+        # At most the last episode is still open; the next update rescans from its peak
+        resume = int(start[~closed][0]) if not closed.all() else len(dates) - 1
+        while resume > 0 and not values[resume] > 0:
+            resume -= 1  # A blank row only carries the peak; rescan from the level itself
+        self._resume = resume
+        self.table = self._episode_table(*(np.concatenate([old, part[~closed]]) for old, part in zip(self._closed, new)))
+        return True
+
+    def _episode_table(self, start, trough, recovery, depth):
+        dates = self.dates
+        end = np.where(recovery >= 0, recovery, len(dates) - 1)
+        days = lambda a, b: (dates[b] - dates[a]) / np.timedelta64(1, 'D')
+        return pd.DataFrame({
+            "Start": dates[start],
+            "Trough": dates[trough],
+            "Recovery": np.where(recovery >= 0, dates[end], np.datetime64('NaT')),
+            "Depth %": depth,
+            "Duration (days)": days(start, end),
+            "Days to Trough": days(start, trough),
+            "Days to Recover": np.where(recovery >= 0, days(trough, end), np.nan),
+        })
+
+@st.cache_resource
+def get_drawdown_engines():
+    return EngineCache(DrawdownEpisodes, "drawdown")
+
+#***********************
+# Performance report (QuantStats tearsheet)
+# Built once per NAV history version (NavHistory.version) on a background thread and kept on
+# disk, so every session and server restart reuses it until the sheet data changes.
+TEARSHEET_DIR = os.path.join(DATA_DIR, "tearsheets")
+TEARSHEET_KEEP = 5  # Report versions kept on disk
+
+class Tearsheets:
+    """Disk cache of QuantStats reports per sheet and data version, built off the page thread.
+
+    Files are tearsheet-<sheet key>-<version>.html plus a .csv of the metrics table;
+    the HTML is renamed into place last, so its presence means the report is complete.
+    """
+
+    def __init__(self, root, keep=TEARSHEET_KEEP):
+        self.root = root
+        self.keep = keep
+        self._building = set()
+        self._errors = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)  # One build at a time; matplotlib is not thread-safe
+        self._lock = threading.Lock()
+
+    def paths(self, key, version):
+        base = os.path.join(self.root, f"tearsheet-{key}-{version}")
+        return f"{base}.html", f"{base}.csv"
+
+    def get(self, key, version, history, title):
+        """("ready", version) when the report exists, else ("building" or "failed", message).
+
+        A missing report is queued for building; until it is done, latest_ready() has
+        the report for the previous data version.
+        """
+        if os.path.exists(self.paths(key, version)[0]):
+            return "ready", version
+        with self._lock:
+            if (key, version) in self._errors:
+                return "failed", self._errors[(key, version)]
+            if (key, version) not in self._building:
+                self._building.add((key, version))
+                self._executor.submit(self._build, key, version, history.copy(), title)
+        return "building", "The report for the latest data is being built."
+
+    def _reports(self, key):
+        """Finished report versions for `key`, newest first."""
+        prefix = f"tearsheet-{key}-"
+        try:
+            entries = [entry for entry in os.scandir(self.root)
+                       if entry.name.startswith(prefix) and entry.name.endswith(".html")]
+        except FileNotFoundError:
+            return []
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [entry.name[len(prefix):-len(".html")] for entry in entries]
+
+    def latest_ready(self, key):
+        """Version of the newest finished report for `key`, or None."""
+        reports = self._reports(key)
+        return reports[0] if reports else None
+
+    def _build(self, key, version, history, title):
+        try:
+            with span("tearsheet.build", version=version, rows=len(history)):
+                self._write_report(key, version, history, title)
+            for old in self._reports(key)[self.keep:]:
+                for path in self.paths(key, old):
+                    if os.path.exists(path):
+                        os.remove(path)
+        except Exception as e:
+            with self._lock:
+                self._errors[(key, version)] = f"{type(e).__name__}: {e}"
+        finally:
+            with self._lock:
+                self._building.discard((key, version))
+
+    def _write_report(self, key, version, history, title):
+        try:
+            import matplotlib
+            matplotlib.use("Agg")  # No display on the server
+            import quantstats as qs  # Slow to import, so only when a report is actually built
+        except ImportError:
+            raise ImportError("QuantStats is not installed (pip install -r requirements.txt)") from None
+
+        history = history[history['nav'] > 0].set_index('date')
+        returns = history['nav'].pct_change().dropna().rename(title)
+        benchmark = None
+        if 'nifty50 value' in history.columns and (history['nifty50 value'] > 0).all():
+            benchmark = history['nifty50 value'].pct_change().dropna().rename("Nifty50")
+
+        os.makedirs(self.root, exist_ok=True)
+        html_path, csv_path = self.paths(key, version)
+        metrics = qs.reports.metrics(returns, benchmark, rf=RISK_FREE_RATE, mode="full", display=False)
+        metrics.to_csv(f"{csv_path}.tmp")
+        qs.reports.html(returns, benchmark, rf=RISK_FREE_RATE, title=f"{title} Tearsheet", output=f"{html_path}.tmp")
+        os.replace(f"{csv_path}.tmp", csv_path)
+        os.replace(f"{html_path}.tmp", html_path)
+
+    @functools.lru_cache(maxsize=4)
+    def read(self, key, version):
+        """(html, metrics DataFrame) of a finished report; its files never change once written."""
+        html_path, csv_path = self.paths(key, version)
+        with open(html_path, encoding="utf-8") as f:
+            html = f.read()
+        return html, pd.read_csv(csv_path, index_col=0)
+
+@st.cache_resource
+def get_tearsheets():
+    return Tearsheets(TEARSHEET_DIR)
+
+#***********************
+# Chart helpers
+CHART_POINT_BUDGET = 1500   # points per line sent to the browser
+TABLE_PAGE_SIZE = 250       # rows per page of the Performance Table
+WEBGL_THRESHOLD = 5000      # switch to Scattergl above this many points
 
-# Login page function
-def login():
-    st.title("Login")
-    
-    # Input fields for username and password
-    with st.form(key="login_form", clear_on_submit=True):
-        username = st.text_input("Username")
-        password = st.text_input("Password", type="password")
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the shape of (x, y).
 
-        # Login button
-        submit_button = st.form_submit_button(label="Login")
-        if submit_button:
-            if username == USERNAME and password == PASSWORD:
-                st.session_state.logged_in = True
-                st.success("Logged in successfully!")
-                st.rerun()  # Reload the app after login
-            else:
-                st.error("Invalid username or password")
+    Peaks and troughs survive because each bucket keeps the point forming the
+    largest triangle with its neighbours.
+    """
+    n = len(x)
+    if threshold is None or threshold >= n or threshold < 3:
+        return np.arange(n)
 
-# Main app content function
-def app_content():
+    every = (n - 2) / (threshold - 2)
+    edges = np.floor(np.arange(threshold - 1) * every).astype(np.int64) + 1  # bucket k is [edges[k], edges[k+1])
+    edges[-1] = n - 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for k in range(threshold - 2):
+        lo, hi = edges[k], edges[k + 1]
+        next_lo, next_hi = (edges[k + 1], edges[k + 2]) if k + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[k + 1] = a
+    return selected
 
-    st.set_page_config(layout="wide")  # Set full-width layout
-    
-    # # Replace with your actual Google Sheets CSV URL
-    # google_sheets_url = "https://docs.google.com/spreadsheets/d/e/2PACX-1vTuyGRVZuafIk2s7moScIn5PAUcPYEyYIOOYJj54RXYUeugWmOP0iIToljSEMhHrg_Zp8Vab6YvBJDV/pub?output=csv"
+def line_trace(dates, values, name, color, point_budget=CHART_POINT_BUDGET):
+    """Line trace downsampled to `point_budget` points, rendered with WebGL when it is still large."""
+    x = dates.to_numpy(dtype='datetime64[ns]')
+    y = values.to_numpy(dtype=float)
+    index = lttb_indices(x.astype(np.int64).astype(float), y, point_budget)
+    if len(index) < len(y) and len(y):
+        # Always keep the global extremes (deepest drawdown, highest NAV)
+        index = np.union1d(index, [np.nanargmin(y), np.nanargmax(y)])
+    trace_type = go.Scattergl if len(index) > WEBGL_THRESHOLD else go.Scatter
+    return trace_type(x=x[index], y=y[index], mode='lines', name=name, line=dict(color=color, width=1))
 
-    # # Clear cache before fetching data to ensure fresh data on each run
-    st.cache_data.clear()
-    
-    # @st.cache_data(ttl=0)  # Caching har baar bypass hoga
-    # Google Sheets CSV URL ko modify kar ke unique banayenge taaki cache na ho
-    def get_google_sheet_url(base_url):
-        return f"{base_url}&nocache={random.randint(1000, 9999)}"
-        
-    # Function to fetch fresh data with retry logic
-    def load_data(url, retries=3, delay=2):
-        for attempt in range(retries):
-            try:
-                data = pd.read_csv(get_google_sheet_url(url), header=0)
-                data.columns = data.columns.str.strip().str.lower()  # Normalize column names
-    
-                date_col_candidates = [col for col in data.columns if 'date' in col.lower()]
-                if date_col_candidates:
-                    data['date'] = pd.to_datetime(data[date_col_candidates[0]], errors='coerce')
-    
-                numeric_cols = ['nav', 'day change', 'day change %', 'nifty50 value', 'current value', 
-                                'nifty50 change %', 'dd', 'dd_n50', 'portfolio value', 'absolute gain', 'nifty50']
-                for col in numeric_cols:
-                    if col in data.columns:
-                        data[col] = pd.to_numeric(data[col].astype(str).str.replace(',', '').str.replace('%', ''), errors='coerce')
-    
-                if 'dd' not in data.columns and 'nav' in data.columns:
-                    data['dd'] = data['nav'] - data['nav'].cummax()
-    
-                data.fillna(0, inplace=True)
-                return data  # Fresh data successfully fetched
-    
-            except Exception as e:
-                st.warning(f"Data fetch attempt {attempt+1} failed: {e}")
-                time.sleep(delay)  # Wait before retrying
-    
-        st.error("Failed to fetch fresh data after multiple attempts.")
-        return pd.DataFrame()  # Return empty DataFrame in case of failure
-    
-    # Google Sheet URL
-    google_sheets_url = "https://docs.google.com/spreadsheets/d/e/2PACX-1vTuyGRVZuafIk2s7moScIn5PAUcPYEyYIOOYJj54RXYUeugWmOP0iIToljSEMhHrg_Zp8Vab6YvBJDV/pub?output=csv"
-    
-    # Fetch fresh data without caching
-    data = load_data(google_sheets_url)
-    
-    # Helper function to fetch Nifty50 data
-    def get_nifty50_data(start_date, end_date):
-        """Fetches Nifty50 data from Yahoo Finance."""
-        nifty = yf.Ticker("^NSEI")  # Nifty50 ticker symbol
-        hist = nifty.history(start=start_date, end=end_date)
-        return hist
-    
-    # Get yesterday's and today's date
-    yesterday = date.today() - timedelta(days=1)
-    today = date.today()
-    
-    # Ensure yesterday is not Saturday or Sunday
-    if yesterday.weekday() >= 5:
-        yesterday -= timedelta(days=yesterday.weekday() - 4)
-    
-    # Get Nifty50 data for yesterday and today
-    nifty_yesterday_data = get_nifty50_data(yesterday, yesterday + timedelta(days=1))
-    nifty_today_data = get_nifty50_data(today, today + timedelta(days=1))
-    
-    # Get current Nifty50 value
-    nifty = yf.Ticker("^NSEI")
-    nifty_info = nifty.info
-    
-    # Get yesterday's closing price
-    if len(nifty_yesterday_data) >= 1:
-        nifty_yesterday = nifty_yesterday_data['Close'].iloc[-1]
-    else:
-        nifty_yesterday = 0
-    
-    # Try to get today's closing price
-    if len(nifty_today_data) >= 1:
-      nifty_today_close = nifty_today_data['Close'].iloc[-1]
-    else:
-      nifty_today_close = 0
-    
-    # Try to get current price, with fallbacks
-    if "currentPrice" in nifty_info:
-        nifty_current = nifty_info["currentPrice"]
-    elif "regularMarketPrice" in nifty_info:
-        nifty_current = nifty_info["regularMarketPrice"]
+def build_nav_figure(filtered_data, point_budget=CHART_POINT_BUDGET):
+    """Model Live Chart: strategy NAV against NIFTY50."""
+    fig = go.Figure()
+    fig.add_trace(line_trace(filtered_data['date'], filtered_data['nav'], 'Strategy', '#244bef', point_budget))
+    fig.add_trace(line_trace(filtered_data['date'], filtered_data['nifty50 value'], 'Nifty50', '#FB3234', point_budget))
+    fig.update_layout(
+        height=600,
+        plot_bgcolor='#f0f2f6',  # Light grey background
+        xaxis=dict(
+            showgrid=True,  # Enable grid lines
+            gridcolor='white',  # Set grid lines to white
+            showline=True,  # Show axis lines
+            linecolor='white',  # Axis line color
+            tickfont=dict(size=16)  # Increase x-axis font size to 16
+        ),
+        yaxis=dict(
+            showgrid=True,  # Enable grid lines
+            gridcolor='white',  # Set grid lines to white
+            showline=True,  # Show axis lines
+            linecolor='white',  # Axis line color
+            tickfont=dict(size=16)  # Increase y-axis font size to 16
+        ),
+        legend=dict(
+            orientation="h",  # Horizontal orientation
+            yanchor="bottom",  # Align to bottom of the legend box
+            y=1.02,  # Place above the chart
+            xanchor="center",
+            x=0.5,  # Center the legend horizontally
+            font=dict(size=16)  # Increase legend font size to 16
+        )
+    )
+    return fig
+
+def build_drawdown_figure(filtered_data, point_budget=CHART_POINT_BUDGET):
+    """Drawdown Live Chart for the strategy and NIFTY50."""
+    fig_dd = go.Figure()
+    fig_dd.add_trace(line_trace(filtered_data['date'], filtered_data['dd'], 'Strategy Drawdown', '#244bef', point_budget))
+    fig_dd.add_trace(line_trace(filtered_data['date'], filtered_data['dd_n50'], 'Nifty50 Drawdown', '#FB3234', point_budget))
+    fig_dd.update_layout(
+        plot_bgcolor='#f0f2f6',
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='white',
+            showline=True,
+            linecolor='white',
+            tickfont=dict(size=16)  # Increase x-axis font size to 16
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='white',
+            showline=True,
+            linecolor='white',
+            tickfont=dict(size=16)  # Increase y-axis font size to 16
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5,
+            font=dict(size=16)  # Increase legend font size to 16
+        )
+    )
+    return fig_dd
+
+def build_heatmap_figure(portfolio_data):
+    """Treemap of today's change per holding (box size = absolute change)."""
+    # Create a treemap heatmap using Plotly
+    fig = px.treemap(
+        portfolio_data,
+        path=["Portfolio"],  # Stock names as labels
+        values="Size",  # Use "Size" column for box sizing
+        color="Today Change",  # Use "Today Change" for coloring
+        color_continuous_scale=[
+            "#8B0000",  # Dark Red
+            "#FF4500",  # Red-Orange
+            "#FF6347",  # Tomato Red
+            "#F0F0F0",  # Neutral Gray
+            "#90EE90",  # Light Green
+            "#32CD32",  # Lime Green
+            "#006400"   # Dark Green
+        ],  # Custom color grading
+        range_color=[-5, 5],  # Fix color scale range to include negative values
+        custom_data=["Today Change"],  # Pass "Today Change" as custom data
+    )
+
+    fig.update_traces(
+        textinfo="label+text",  # Show stock name and percentage change
+        texttemplate="%{label}<br>%{customdata[0]:.2f}%",  # Format text to show label and percentage change
+        textfont=dict(color="white"),
+        textfont_size=1,  # Increase font size
+        insidetextfont=dict(size=30, family="Arial"),  # Adjust inside text font properties
+        textposition="middle center",  # Center the text inside the box
+    )
+
+    fig.update_layout(
+        margin=dict(t=0, l=0, r=0, b=50),  # Adjust margins to make space for the color bar
+        height=600,  # Fix height to control the chart’s size
+        coloraxis_colorbar=dict(
+            title="Change (%)",
+            tickvals=[-5, -3, -2, -1, 0, 1, 2, 3, 5],  # Custom tick values
+            ticktext=["-5%", "-3%", "-2%", "-1%", "0%", "+1%", "+2%", "+3%", "+5%"],  # Custom tick labels
+            orientation="h",  # Horizontal alignment
+            x=0.5,  # Move to bottom center
+            y=-0.1,  # Move below chart
+            len=0.8,  # Length of the color bar
+            thickness=10,  # Thickness of the color bar
+            tickfont=dict(size=12, family="Arial"),  # Match font style
+        ),
+        # Set background color of the Plotly chart container
+        plot_bgcolor="white",  # Background inside the plot area
+        paper_bgcolor="white",  # Background outside the plot area
+    )
+    return fig
+
+def sign_styles(values, positive, negative, other=""):
+    """CSS per value by sign for a whole column at once (for Styler.apply)."""
+    return np.select([values > 0, values < 0], [positive, negative], other)
+
+def style_change_table(frame, column):
+    """Gainers/losers/indices: numbers stay numeric, colored green/red by sign."""
+    return (frame.style
+            .apply(sign_styles, subset=[column], positive="color: green", negative="color: red", other="color: black")
+            .format({column: "{:.2f}%"}, na_rep="-")
+            .hide(axis='index'))
+
+def performance_table_pages(filtered_data, page_size=TABLE_PAGE_SIZE):
+    """Number of Performance Table pages (at least one)."""
+    return max(1, -(-len(filtered_data) // page_size))
+
+def style_performance_table(filtered_data, page=0, page_size=TABLE_PAGE_SIZE):
+    """One page of daily strategy vs NIFTY50 returns, newest first, colored by sign.
+
+    Only the page's rows are sliced out and styled, so the cost stays the same
+    however long the selected range is.
+    """
+    # History is sorted by date, so newest first is a reversed positional slice
+    end = len(filtered_data) - page * page_size
+    rows = filtered_data.iloc[max(0, end - page_size):max(0, end)].iloc[::-1]
+    table_data = pd.DataFrame({
+        'Date': rows['date'].dt.strftime('%d-%m-%Y').to_numpy(),
+        'Strategy': rows['day change %'].to_numpy(dtype=float),
+        'Nifty50': rows['nifty50 change %'].to_numpy(dtype=float),
+    })
+
+    # Zero (and missing) days count as red, as before
+    return (table_data.style
+            .apply(sign_styles, subset=['Strategy', 'Nifty50'],
+                   positive='background-color: #caf1b0', negative='background-color: #FFD6D7',
+                   other='background-color: #FFD6D7')
+            .format("{:.2f}", subset=['Strategy', 'Nifty50']))
+
+def build_compare_figure(ranges, column, point_budget=CHART_POINT_BUDGET, rebase=False):
+    """One line per strategy plus NIFTY50 (from the first strategy's sheet).
+
+    `ranges` maps strategy name -> NAV history slice. With `rebase`, every line
+    starts at 100 so strategies with different NAV levels overlay cleanly.
+    """
+    benchmark = {"nav": "nifty50 value", "dd": "dd_n50"}[column]
+    colors = px.colors.qualitative.Plotly
+
+    def values(frame, name):
+        series = frame[name]
+        if rebase:
+            start = series[series != 0]
+            series = series / start.iloc[0] * 100 if not start.empty else series
+        return series
+
+    fig = go.Figure()
+    for i, (name, frame) in enumerate(ranges.items()):
+        fig.add_trace(line_trace(frame['date'], values(frame, column), name, colors[i % len(colors)], point_budget))
+    first = next(iter(ranges.values()))
+    fig.add_trace(line_trace(first['date'], values(first, benchmark), 'Nifty50', '#7f7f7f', point_budget))
+    fig.update_layout(
+        height=500,
+        plot_bgcolor='#f0f2f6',
+        xaxis=dict(showgrid=True, gridcolor='white', showline=True, linecolor='white', tickfont=dict(size=14)),
+        yaxis=dict(showgrid=True, gridcolor='white', showline=True, linecolor='white', tickfont=dict(size=14)),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5, font=dict(size=14))
+    )
+    return fig
+
+def compare_returns_table(ranges):
+    """Horizon returns (rows) per strategy (columns), NIFTY50 last."""
+    columns = {name: compute_performance_table(frame)["Strategy"] for name, frame in ranges.items()}
+    columns["Nifty50"] = compute_performance_table(next(iter(ranges.values())))["Nifty50"]
+    return pd.DataFrame(columns)
+
+def build_calendar_figure(table):
+    """Years x months grid of returns, colored around 0 and labelled with the values."""
+    z = table.to_numpy(dtype=float)
+    text = np.where(np.isnan(z), "", np.char.mod("%.1f", np.nan_to_num(z)))
+    monthly = z[:, :-1][~np.isnan(z[:, :-1])]
+    limit = max(np.percentile(np.abs(monthly), 95), 1) if len(monthly) else 5  # YTD cells saturate instead of washing out months
+    fig = go.Figure(go.Heatmap(
+        z=z, x=list(table.columns), y=[str(year) for year in table.index],
+        text=text, texttemplate="%{text}", textfont=dict(size=12),
+        colorscale=[[0, "#FB3234"], [0.5, "#F0F0F0"], [1, "#1a9641"]], zmin=-limit, zmax=limit,
+        showscale=False, xgap=2, ygap=2,
+        hovertemplate="%{y} %{x}: %{z:.2f}%<extra></extra>",
+    ))
+    fig.update_layout(
+        height=max(180, 30 * len(table) + 60),
+        margin=dict(t=30, l=10, r=10, b=10),
+        plot_bgcolor='white',
+        xaxis=dict(side="top", tickfont=dict(size=13)),
+        yaxis=dict(autorange="reversed", type="category", tickfont=dict(size=13)),
+    )
+    return fig
+
+def build_risk_figure(frame, metric, point_budget=CHART_POINT_BUDGET):
+    """Rolling `metric` over time (volatility is drawn for NIFTY50 as well)."""
+    frame = frame.dropna(subset=[metric])
+    fig = go.Figure()
+    fig.add_trace(line_trace(frame['date'], frame[metric], f'Strategy {metric}', '#244bef', point_budget))
+    if metric == "Volatility":
+        fig.add_trace(line_trace(frame['date'], frame["Nifty50 Volatility"], 'Nifty50 Volatility', '#FB3234', point_budget))
+    fig.update_layout(
+        height=400,
+        plot_bgcolor='#f0f2f6',
+        xaxis=dict(showgrid=True, gridcolor='white', showline=True, linecolor='white', tickfont=dict(size=14)),
+        yaxis=dict(showgrid=True, gridcolor='white', showline=True, linecolor='white', tickfont=dict(size=14)),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5, font=dict(size=14))
+    )
+    return fig
+
+#***********************
+# Figure cache
+FIGURE_CACHE_MB = float(os.environ.get("FIGURE_CACHE_MB", "64"))
+FIGURE_VALUE_BYTES = 20  # Rough JSON size of one array value (number or ISO date)
+
+def figure_size(fig):
+    """Rough JSON size of `fig` in bytes, from its array lengths; encoding it just to measure
+    would cost as much as the build."""
+    def values(node):
+        if isinstance(node, dict):
+            return sum(values(value) for value in node.values())
+        if isinstance(node, (np.ndarray, pd.Series, pd.Index, list, tuple)):
+            return len(node)
+        return 1
+    size = len(json.dumps(fig.layout.to_plotly_json(), default=str))
+    for trace in fig.data:
+        size += values(trace.to_plotly_json()) * FIGURE_VALUE_BYTES
+    return size
+
+class FigureCache:
+    """LRU of built Plotly figures shared by every session, bounded by their (estimated) JSON size.
+
+    Keys are (chart, data version, view parameters...), so a figure is reused
+    until its data changes or it falls out of the LRU. A hit skips the build
+    (downsampling, traces, layout); st.plotly_chart still serializes what it's given.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (figure, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, build):
+        """The cached figure for `key`, or build() it and keep it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+
+        # Built outside the lock; two sessions missing the same key both build, last one is kept
+        fig = build()
+        size = figure_size(fig)
+        with self._lock:
+            if size > self.max_bytes:
+                return fig
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (fig, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.stats["evictions"] += 1
+        return fig
+
+    @property
+    def size_mb(self):
+        return self._bytes / 2**20
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache():
+    return FigureCache(int(FIGURE_CACHE_MB * 2**20))
+
+def format_indian_currency(amount):
+    """Formats a number to Indian currency format (lakhs and crores) manually, handling negatives."""
+    is_negative = False
+    if amount < 0:
+        is_negative = True
+        amount = abs(amount)  # Work with the absolute value
+
+    amount = int(amount)  # Convert to integer
+    s = str(amount)
+    if len(s) <= 3:
+        formatted_value = s
+    elif len(s) == 4:
+      formatted_value = s[0]+","+s[1:]
+    elif len(s) == 5:
+      formatted_value = s[:2]+","+s[2:]
+    elif len(s) == 6:
+        formatted_value = s[:1] + "," + s[1:3] + "," + s[3:]
+    elif len(s) == 7:
+        formatted_value = s[:2] + "," + s[2:4] + "," + s[4:]
+    elif len(s) == 8:
+        formatted_value = s[:1] + "," + s[1:3] + "," + s[3:5] + "," + s[5:]
+    elif len(s) == 9:
+        formatted_value = s[:2] + "," + s[2:4] + "," + s[4:6] + "," + s[6:]
     else:
-        nifty_current = nifty_today_close  # Fallback to today's close
-    
-    # If there is no current price, we use the close
-    if nifty_current == 0:
-      nifty_current = nifty_today_close
-    
-    # Calculate Nifty50 percentage change
-    if nifty_yesterday != 0:
-        nifty_change_percent = ((nifty_current - nifty_yesterday) / nifty_yesterday) * 100
+        formatted_value = "Value too big"
+
+    if is_negative:
+        return "-" + formatted_value  # Reattach the negative sign
     else:
-        nifty_change_percent = 0
-    
-    #******************************************
-    
-    portfolio_value_raw = data.iloc[0, 0]  # Portfolio value from cell [0,0]
-    nifty50_value_raw = data.iloc[0, 2]  # Nifty50 value from cell [0,2]
-    day_change_raw = data.iloc[2, 0]  # Day Change from cell [0,3]
-    absolute_gain_raw = data.iloc[0, 1]
-    previous_value_raw = data.iloc[4, 0]
-    xirr_raw = data.iloc[2, 1]  # XIRR value from cell [2,1]
-    
-    portfolio_value = pd.to_numeric(portfolio_value_raw, errors='coerce')
-    nifty50_value = pd.to_numeric(nifty50_value_raw, errors='coerce')
-    day_change = pd.to_numeric(day_change_raw, errors='coerce')
-    absolute_gain = pd.to_numeric(absolute_gain_raw, errors='coerce')
-    previous_value = pd.to_numeric(previous_value_raw, errors='coerce')
-    xirr_value = pd.to_numeric(xirr_raw, errors='coerce')
-    
-    # Calculate instant day change
-    day_change = portfolio_value - previous_value
-    day_change_percent = (day_change / previous_value * 100) if previous_value != 0 else 0
-    
-    def format_indian_currency(amount):
-        """Formats a number to Indian currency format (lakhs and crores) manually, handling negatives."""
-        is_negative = False
-        if amount < 0:
-            is_negative = True
-            amount = abs(amount)  # Work with the absolute value
-    
-        amount = int(amount)  # Convert to integer
-        s = str(amount)
-        if len(s) <= 3:
-            formatted_value = s
-        elif len(s) == 4:
-          formatted_value = s[0]+","+s[1:]
-        elif len(s) == 5:
-          formatted_value = s[:2]+","+s[2:]
-        elif len(s) == 6:
-            formatted_value = s[:1] + "," + s[1:3] + "," + s[3:]
-        elif len(s) == 7:
-            formatted_value = s[:2] + "," + s[2:4] + "," + s[4:]
-        elif len(s) == 8:
-            formatted_value = s[:1] + "," + s[1:3] + "," + s[3:5] + "," + s[5:]
-        elif len(s) == 9:
-            formatted_value = s[:2] + "," + s[2:4] + "," + s[4:6] + "," + s[6:]
-        else:
-            formatted_value = "Value too big"
-    
-        if is_negative:
-            return "-" + formatted_value  # Reattach the negative sign
-        else:
-            return formatted_value
-    
-    # Try to set locale, but handle potential errors
-    # try:
-    #     locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
-    # except locale.Error:
-    #     print("Warning: 'en_US.UTF-8' locale not supported. Number formatting might be incorrect.")
-    # # Display the Last Update Time
-    # desired_timezone = pytz.timezone('Asia/Kolkata')  # India Standard Time (IST)
-    # utc_now = datetime.datetime.now(pytz.utc)
-    # local_now = utc_now.astimezone(desired_timezone)
-    # formatted_time = local_now.strftime('%d-%m-%Y %H:%M:%S')
-    # # st.info for the Last Update
-    # st.write(f"Last Update: {formatted_time}")
-    # st.markdown("<br><br>", unsafe_allow_html=True)
-    #**********************************
-    # Extract the top 10 losers and top 10 gainers
-    top_10_gainers = data.iloc[:, [14, 15, 16]].head(10)  # Columns O, P, Q
-    top_10_gainers.columns = ["Symbol", "CMP", "Change%"]
-    top_10_loosers = data.iloc[:, [18, 19, 20]].head(10)  # Columns S, T, U
-    top_10_loosers.columns = ["Symbol", "CMP", "Change%"]
-    
-    # Ensure "Change%" column is numeric after removing '%'
-    top_10_gainers["Change%"] = top_10_gainers["Change%"].str.replace('%', '').astype(float)
-    top_10_loosers["Change%"] = top_10_loosers["Change%"].str.replace('%', '').astype(float)
-
-    # Function to fetch portfolio stock list dynamically
-    def fetch_stock_list():
-        df = pd.read_csv(google_sheets_url)
-        if "Portfolio" in df.columns:
-            return df["Portfolio"].dropna().tolist()[:30]  # Fetch first 30 stock names
-        else:
-            st.error("Portfolio column not found in Google Sheet.")
-            return []
+        return formatted_value
 
-    # Get the full stock list
-    full_stock_list = fetch_stock_list()
-    
-    # Extract the middle 10 stocks (excluding top 10 losers and top 10 gainers)
-    middle_stocks = [stock for stock in full_stock_list if stock not in top_10_loosers["Symbol"].tolist() and stock not in top_10_gainers["Symbol"].tolist()]
+# Try to set locale, but handle potential errors
+# try:
+#     locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
+# except locale.Error:
+#     print("Warning: 'en_US.UTF-8' locale not supported. Number formatting might be incorrect.")
+# # Display the Last Update Time
+# desired_timezone = pytz.timezone('Asia/Kolkata')  # India Standard Time (IST)
+# utc_now = datetime.datetime.now(pytz.utc)
+# local_now = utc_now.astimezone(desired_timezone)
+# formatted_time = local_now.strftime('%d-%m-%Y %H:%M:%S')
+# # st.info for the Last Update
+# st.write(f"Last Update: {formatted_time}")
+# st.markdown("<br><br>", unsafe_allow_html=True)
 
-    # Reverse the order of top 10 loosers (highest loosers at the bottom)
-    top_10_loosers_reversed = top_10_loosers["Symbol"].tolist()[::-1]
+#***********************
+# Page sections
+# Each section is an st.fragment, so a widget inside it reruns only that section.
+# Sections pull their inputs from the process-wide caches; "Depends on" lists them.
 
-    # Combine the lists in the desired order: top 10 losers → middle 10 stocks → reversed top 10 gainers
-    combined_stock_list =  top_10_gainers["Symbol"].tolist() + middle_stocks + top_10_loosers_reversed
-  
-    # Update the stock_list variable with the combined list
-    stock_list = combined_stock_list
-    
-    # # Fetch stock list from Google Sheet
-    # stock_list = fetch_stock_list()
-    #******************************
-    # Function to fetch portfolio data from Google Sheets
-    def fetch_portfolio_data():
+def get_quotes():
+    """Index quotes: the refresher's latest when it is running, else a shared live fetch."""
+    store = get_snapshot_store()
+    with span("quotes.get") as record:
+        if store.is_alive():
+            _, quotes = store.read("quotes", quotes_from_json)
+            if quotes is not None:
+                record["source"] = "refresher"
+                return quotes
+        record["source"] = "live"
+        fetch_shared_quotes()
+        return dict(get_last_good_quotes())  # Includes what background retries got since
+
+@st.cache_resource(ttl=QUOTE_CACHE_TTL, show_spinner=False)  # Also runs on page-fetch threads
+def fetch_shared_quotes():
+    """Index quotes shared by every session for QUOTE_CACHE_TTL seconds.
+
+    Tickers Yahoo did not answer this time keep their last good quote (see Quote.as_of)
+    and are retried with backoff in the background.
+    """
+    tickers = list(INDICES.values())
+    quotes = fetch_quotes(tickers)
+    last_good = get_last_good_quotes()
+    last_good.update(quotes)
+    get_quote_fetch_times()["shared"] = time.time()
+    get_quote_retrier().retry([ticker for ticker in tickers if ticker not in quotes])
+    return dict(last_good)
+
+class QuoteRetrier:
+    """Retries tickers Yahoo did not answer on a background thread (fetch_quotes_with_backoff)
+    and merges what arrives into the last good quotes. A ticker is retried by one thread at a time."""
+
+    def __init__(self, last_good, retries=QUOTE_RETRIES):
+        self.last_good = last_good
+        self.retries = retries
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def retry(self, tickers):
+        with self._lock:
+            tickers = [ticker for ticker in tickers if ticker not in self._pending]
+            self._pending.update(tickers)
+        if tickers:
+            threading.Thread(target=self._run, args=(tickers,), daemon=True).start()
+
+    def _run(self, tickers):
         try:
-            df = pd.read_csv(google_sheets_url)
-            if "Portfolio" in df.columns and "Today Change" in df.columns:
-                # Extract and preprocess the data
-                df = df[["Portfolio", "Today Change"]].dropna()
-                df["Today Change"] = df["Today Change"].str.replace('%', '', regex=False).astype(float)  # Remove '%' and convert to float
-                df = df.head(30)  # Limit to the first 30 stocks
-                df["Size"] = df["Today Change"].abs()  # Add column for box sizing
-                return df
-            else:
-                st.error("Required columns ('Portfolio', 'Today Change') not found in the Google Sheet.")
-                return pd.DataFrame()
-        except Exception as e:
-            st.error(f"Error fetching data: {e}")
-            return pd.DataFrame()
-    
-    # Fetch data
-    portfolio_data = fetch_portfolio_data()
-    
-    #******************************
-    
-    
-        
+            with span("quotes.retry", tickers=len(tickers)) as record:
+                # The fetch right before this already failed, so start with a backoff sleep too
+                time.sleep(backoff_delay(0))
+                quotes = fetch_quotes_with_backoff(tickers, self.retries)
+                self.last_good.update(quotes)
+                record["recovered"] = len(quotes)
+        finally:
+            with self._lock:
+                self._pending.difference_update(tickers)
+
+@st.cache_resource(show_spinner=False)
+def get_quote_retrier():
+    return QuoteRetrier(get_last_good_quotes())
+
+@st.cache_resource(show_spinner=False)
+def get_quote_fetch_times():
+    return {}  # "shared" -> time.time() when fetch_shared_quotes() last ran
+
+def quotes_cached():
+    """Whether get_quotes() would answer without calling Yahoo."""
+    store = get_snapshot_store()
+    if store.is_alive() and store.version("quotes") is not None:
+        return True
+    fetched_at = get_quote_fetch_times().get("shared")
+    return fetched_at is not None and time.time() - fetched_at < QUOTE_CACHE_TTL - 1
+
+@st.cache_resource(show_spinner=False)
+def get_last_good_quotes():
+    return {}  # ticker -> latest Quote Yahoo returned
+
+def stale_since(as_of, max_age):
+    """'DD-MM HH:MM' (IST) of `as_of` when it is older than max_age seconds, else None."""
+    if as_of is None or time.time() - as_of <= max_age:
+        return None
+    return datetime.datetime.fromtimestamp(as_of, IST).strftime('%d-%m %H:%M')
+
+def page_fetches():
+    """Independent fetches a full page run starts up front (see PageFetcher).
+
+    Only what is not cached yet; the rest is read inline when a section asks for it.
+    """
+    strategies = load_strategies()
+    url = selected_strategy()[1]
+    cache = get_sheet_cache()
+    store = get_snapshot_store()
+    alive = store.is_alive()
+    def cached(url):
+        return cache.peek(url) is not None or (alive and store.version(f"sheet-{source_key(url)}") is not None)
+
+    jobs = {}
+    if not cached(url):
+        jobs["sheet"] = lambda: cache.get(url)
+    if not quotes_cached():
+        jobs["quotes"] = get_quotes
+    if len(strategies) > 1:
+        # Warms the sheets the compare view will ask for; it joins these downloads if still running
+        for name in st.session_state.get("compare_strategies", list(strategies)[:5]):
+            if name in strategies and strategies[name] != url and not cached(strategies[name]):
+                jobs[f"sheet:{name}"] = lambda url=strategies[name]: cache.get(url)
+    return jobs
+
+def load_page_snapshot():
+    """Cached sheet snapshot; stops the run (or fragment) when none is available."""
+    url = selected_strategy()[1]
+    try:
+        snapshot = get_page_fetcher().result("sheet", lambda: get_sheet_cache().get(url))
+    except TimeoutError:
+        st.info("The Google Sheet is taking longer than usual to load. It keeps loading in the background.")
+        st.button("Reload")
+        st.stop()
+    if snapshot is None:
+        st.error("Could not load the Google Sheet and no earlier copy is saved. Try again in a minute.")
+        st.stop()
+    return snapshot
+
+def page_quotes():
+    """Index quotes for this run, or None when they missed the page deadline."""
+    try:
+        return get_page_fetcher().result("quotes", get_quotes)
+    except TimeoutError:
+        return None
+
+# Live header: every LIVE_HEADER_INTERVAL seconds only the header fragment reruns, and it re-reads
+# just the sheet's header block and the NIFTY quote. Both are fetched once per interval for all
+# sessions, so upstream load does not grow with viewers. With the refresher running, its published
+# sheet and quotes are already current and are used as they are.
+LIVE_HEADER_INTERVAL = float(os.environ.get("LIVE_HEADER_INTERVAL", "30"))
+
+@st.cache_data(ttl=LIVE_HEADER_INTERVAL, show_spinner=False)
+def fetch_header_cells(url):
+    """Header fields from the sheet's header block alone; {} when it cannot be read."""
+    block_url = header_url(url)
+    try:
+        content, _, _ = get_fetch_coordinator().do("sheet", block_url, lambda: download_sheet_bytes(block_url, timeout=5))
+        data, _, _ = clean_sheet_data(read_sheet_csv(content))
+        cells = header_cells(data)
+    except Exception:
+        return {}
+    return {name: value for name, value in cells.items() if pd.notna(value)}
+
+@st.cache_resource(ttl=LIVE_HEADER_INTERVAL, show_spinner=False)
+def fetch_live_nifty_quote():
+    """The NIFTY quote on its own (one ticker instead of every index)."""
+    quotes = fetch_quotes([NIFTY_TICKER], deadline=QUOTE_TIMEOUT)
+    get_last_good_quotes().update(quotes)
+    return quotes.get(NIFTY_TICKER)
+
+def live_header_inputs():
+    """(snapshot, quotes) for the live header: the cached snapshot with fresh header cells.
+
+    Ticks only peek at the cached snapshot, so they never revalidate the full
+    sheet; the header block and the NIFTY quote are all that hit upstream.
+    """
+    if get_snapshot_store().is_alive():
+        return load_page_snapshot(), page_quotes()
+    url = selected_strategy()[1]
+    snapshot = get_sheet_cache().peek(url) or load_page_snapshot()
+    cells = fetch_header_cells(url)
+    quote = fetch_live_nifty_quote() or get_last_good_quotes().get(NIFTY_TICKER)
+    return replace(snapshot, **cells), {NIFTY_TICKER: quote} if quote else {}
+
+@st.fragment
+@timed_section
+def header_section():
+    """Depends on: sheet header cells, latest NAV row, NIFTY quote."""
+    header_metrics(load_page_snapshot(), page_quotes())
+
+@st.fragment(run_every=LIVE_HEADER_INTERVAL)
+@timed_section
+def live_header_section():
+    """header_section that reruns on its own every LIVE_HEADER_INTERVAL seconds."""
+    header_metrics(*live_header_inputs())
+    st.caption(f"Live: updated {now_ist().strftime('%H:%M:%S')}, every {LIVE_HEADER_INTERVAL:.0f}s")
+
+def header_metrics(snapshot, quotes):
+    """The six account metrics; `quotes` is None while they are still loading."""
+    data = snapshot.history
+    nifty_quote = build_nifty_quote((quotes or {}).get(NIFTY_TICKER))
+    nifty_current = nifty_quote.live_price
+    nifty_change_percent = nifty_quote.change_percent
+
+    portfolio_value = snapshot.portfolio_value
+    absolute_gain = snapshot.absolute_gain
+    xirr_value = snapshot.xirr_value
+
+    # Calculate instant day change
+    day_change = snapshot.day_change
+    day_change_percent = snapshot.day_change_percent
+
     # Total Account Overview Section
     # st.write("### Total Account Overview", unsafe_allow_html=True)
     col1, col2, col3, col4, col5, col6 = st.columns([2, 2, 2, 2, 2, 2])  # 6 equal columns
@@ -310,7 +2638,16 @@ def app_content():
     
     with col4:
         st.markdown("<b style='font-size: 18px;'>NIFTY50 Benchmark</b>", unsafe_allow_html=True)
-        st.metric(label="", value=f"{format_indian_currency(nifty_current)}", delta=f"{nifty_change_percent:.2f}%")
+        nifty = (quotes or {}).get(NIFTY_TICKER)
+        if quotes is None:  # Still loading; shows up on the next run
+            st.metric(label="", value="…")
+        elif nifty is None:  # Yahoo has not answered since the server started
+            st.metric(label="", value="N/A")
+        else:
+            st.metric(label="", value=f"{format_indian_currency(nifty_current)}", delta=f"{nifty_change_percent:.2f}%")
+            since = stale_since(nifty.as_of, 2 * QUOTE_CACHE_TTL)
+            if since:
+                st.caption(f"as of {since}")
     
     with col5:
         st.markdown("<b style='font-size: 18px;'>Current Drawdown</b>", unsafe_allow_html=True)
@@ -331,136 +2668,389 @@ def app_content():
     with col6:
         st.markdown("<b style='font-size: 18px;'>Strategy XIRR</b>", unsafe_allow_html=True)
         st.metric(label="", value=f"{xirr_value:.2f}%")  # Display XIRR value with 2 decimal points
-    
+
+@st.fragment
+@timed_section
+def charts_section(start_date, end_date, point_budget):
+    """Depends on: NAV history for the selected range."""
+    history = load_page_snapshot().nav_history
+    filtered_data = history.select_range(start_date, end_date)
+    figures = get_figure_cache()
+    # Keyed by row positions, so date ranges covering the same rows share a figure
+    view = (history.version, history.positions(start_date, end_date), point_budget)
+    st.info("##### Model Live Chart")
+    with span("render.nav_chart", rows=len(filtered_data)):
+        fig = figures.get(("nav",) + view, lambda: build_nav_figure(filtered_data, point_budget))
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.info("##### Drawdown Live Chart")
+    with span("render.drawdown_chart", rows=len(filtered_data)):
+        fig_dd = figures.get(("drawdown",) + view, lambda: build_drawdown_figure(filtered_data, point_budget))
+        st.plotly_chart(fig_dd, use_container_width=True)
+
+@st.fragment
+@timed_section
+def drawdown_section(start_date, end_date):
+    """Depends on: full NAV history (episodes can start before the range)."""
+    snapshot = load_page_snapshot()
+    url = selected_strategy()[1]
+    st.info("##### Drawdown Episodes")
+    start, end = np.datetime64(pd.Timestamp(start_date), 'ns'), np.datetime64(pd.Timestamp(end_date), 'ns')
+    for tab, column in zip(st.tabs(["Strategy", "Nifty50"]), ["nav", "nifty50 value"]):
+        episodes = get_drawdown_engines().get(url, snapshot.nav_history.frame, column)
+        # Deepest episodes that overlap the selected range
+        overlapping = episodes[(episodes["Start"] <= end) & (episodes["Recovery"].isna() | (episodes["Recovery"] >= start))]
+        deepest = overlapping.nsmallest(10, "Depth %")
+        with tab:
+            if deepest.empty:
+                st.write("No drawdowns in the selected range.")
+                continue
+            date_format = lambda d: d.strftime('%d-%m-%Y') if pd.notna(d) else "Ongoing"
+            st.dataframe(deepest.style.format({"Start": date_format, "Trough": date_format, "Recovery": date_format,
+                                               "Depth %": "{:.2f}%", "Duration (days)": "{:.0f}",
+                                               "Days to Trough": "{:.0f}", "Days to Recover": "{:.0f}"}, na_rep="-"),
+                         hide_index=True, use_container_width=True)
+
+@st.fragment
+@timed_section
+def calendar_section():
+    """Depends on: full NAV history (aggregated once per data version)."""
+    history = load_page_snapshot().nav_history
+    st.info("##### Calendar Returns (%)")
+    for tab, column in zip(st.tabs(["Strategy", "Nifty50"]), ["nav", "nifty50 value"]):
+        table = cached_calendar_returns(history.version, column, history.frame)
+        with tab:
+            if table.empty:
+                st.write("No data available.")
+                continue
+            with span("render.calendar", years=len(table)):
+                fig = get_figure_cache().get(("calendar", history.version, column), lambda: build_calendar_figure(table))
+                st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+@timed_section
+def risk_section(start_date, end_date, point_budget):
+    """Depends on: full NAV history (windows reach back before the range), selected window."""
+    snapshot = load_page_snapshot()
+    frames = get_risk_engines().get(selected_strategy()[1], snapshot.nav_history.frame)
+    st.info("##### Rolling Risk")
+    window = st.radio("Window (trading days)", list(frames), index=len(frames) - 1, horizontal=True, key="risk_window")
+    metric = st.selectbox("Metric", RISK_COLUMNS[1:] + RISK_COLUMNS[:1], key="risk_metric")
+
+    frame = frames[window]
+    dates = frame['date'].to_numpy()
+    lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left')
+    hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='right')
+    frame = frame.iloc[lo:hi]
+    if frame[metric].isna().all():
+        st.warning(f"Not enough history in the selected range for a {window}-day window.")
+        return
+    with span("render.risk_chart", rows=len(frame)):
+        key = ("risk", snapshot.nav_history.version, window, metric, (lo, hi), point_budget)
+        fig = get_figure_cache().get(key, lambda: build_risk_figure(frame, metric, point_budget))
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Latest value of every metric for each window, at the end of the selected range
+    latest = {}
+    for w, window_frame in frames.items():
+        rows = window_frame.iloc[:hi][RISK_COLUMNS].dropna(how="all")  # Every window shares the same dates
+        latest[f"{w}d"] = rows.iloc[-1] if len(rows) else pd.Series(np.nan, index=RISK_COLUMNS)
+    st.dataframe(pd.DataFrame(latest).T.style.format("{:.2f}", na_rep="-"), use_container_width=True)
+
+@st.fragment
+@timed_section
+def symbol_overview_section():
+    """Depends on: portfolio stock list."""
+    stock_list = load_page_snapshot().stock_list
+    # Dropdown to select a stock
+    if stock_list:
+        st.info("##### Portfolio Symbol Overview")
+        selected_stock = st.selectbox("",stock_list)
+
+        # TradingView widget code
+        if selected_stock:
+            widget_code = f"""
+            <!-- TradingView Widget BEGIN -->
+            <div class="tradingview-widget-container" style="width: 100%; max-width: 980px; margin: 0 auto;">
+                <div class="tradingview-widget-container__widget" style="height: 610px; width: 100%;"></div>
+                <div class="tradingview-widget-copyright"></div>
+                <script type="text/javascript" src="https://s3.tradingview.com/external-embedding/embed-widget-advanced-chart.js" async>
+                {{
+                    "width": "935",
+                    "height": "530",
+                    "symbol": "{selected_stock}",
+                    "interval": "D",
+                    "timezone": "Etc/UTC",
+                    "theme": "light",
+                    "style": "1",
+                    "locale": "en",
+                    "allow_symbol_change": true,
+                    "calendar": false,
+                    "show_popup_button": true,
+                    "popup_width": "1000",
+                    "popup_height": "650",
+                    "hide_volume": true,
+                    "support_host": "https://www.tradingview.com"
+                }}
+                </script>
+            </div>
+            <!-- TradingView Widget END -->
+            """
+            # Render the widget in Streamlit
+            st.components.v1.html(widget_code, height=550)  # Height slightly more for padding
+    else:
+        st.warning("No stocks available in the portfolio.")
+
+@st.fragment
+@timed_section
+def heatmap_section():
+    """Depends on: holdings with today's change."""
+    portfolio_data = load_page_snapshot().portfolio_data.copy()
+    # Streamlit App Layout
+    st.markdown("<h3 style='text-align: center;'>Heatmap</h3>", unsafe_allow_html=True)
+
+    # Custom CSS to set background of Streamlit container to white
+    st.markdown("""
+        <style>
+            .reportview-container .main .block-container {
+                background-color: white;
+            }
+            .css-1y4v0b4 {
+                background-color: white;
+            }
+        </style>
+    """, unsafe_allow_html=True)
+
+    if not portfolio_data.empty:
+        # Replace zero values in "Size" column with a small non-zero value
+        portfolio_data["Size"] = portfolio_data["Size"].replace(0, 0.01)
+
+        with span("render.heatmap", holdings=len(portfolio_data)):
+            fig = get_figure_cache().get(("heatmap", frame_version(portfolio_data)), lambda: build_heatmap_figure(portfolio_data))
+
+            # Display the treemap heatmap
+            st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.warning("No data available to display.")
+
+@st.fragment
+@timed_section
+def performance_section(start_date, end_date):
+    """Depends on: NAV history for the selected range."""
+    filtered_data = load_page_snapshot().nav_history.select_range(start_date, end_date)
+    st.info("##### Model Performance")
+    # All horizons are computed together; the radio only picks a row
+    performance_table = compute_performance_table(filtered_data)
+    return_type = st.radio("Select Return Type", list(performance_table.index), index=2)
+    performance = performance_table.loc[return_type, "Strategy"]
+    if pd.notna(performance):
+        st.write(f"{return_type} Performance: {performance:.2f}%")
+    st.dataframe(performance_table.style.format("{:.2f}%", na_rep="-"), use_container_width=True)
+    st.markdown("<br><br>", unsafe_allow_html=True)
+
+    # Add performance table
+    st.info("##### Performance Table")
+
+    # Paged: only one page is styled and sent to the browser
+    pages = performance_table_pages(filtered_data)
+    page = 1
+    if pages > 1:
+        if st.session_state.get("performance_page", 1) > pages:  # Range got shorter
+            st.session_state["performance_page"] = pages
+        page = st.number_input(f"Page (of {pages}, newest first)", min_value=1, max_value=pages, step=1,
+                               key="performance_page")
+    with span("render.performance_table", rows=len(filtered_data), page=page):
+        styled_table = style_performance_table(filtered_data, page - 1)
+
+        # Show dataframe properly in Streamlit
+        st.dataframe(styled_table, hide_index=True)
+
+@st.fragment
+@timed_section
+def indices_section():
+    """Depends on: index quotes (NIFTY quote for the NIFTY 50 row)."""
+    quotes = page_quotes()
+    st.info("##### Broader Indices")
+    if quotes is None:
+        st.caption("Index quotes are still loading; they will show on the next refresh.")
+        return
+    nifty_quote = build_nifty_quote(quotes.get(NIFTY_TICKER))
+    stale = [q.as_of for q in quotes.values() if stale_since(q.as_of, 2 * QUOTE_CACHE_TTL)]
+    if stale:
+        st.caption(f"{len(stale)} of {len(quotes)} quotes are not current (oldest from {stale_since(min(stale), 0)}).")
+
+    # Same cached quotes as the header
+    index_data = []
+    for name, ticker in INDICES.items():
+        if ticker == NIFTY_TICKER:
+            index_data.append([name, nifty_quote.change_percent if nifty_quote.live_price else None])
+            continue
+        quote = quotes.get(ticker)
+        index_data.append([name, quote.change_percent if quote is not None else None])
+
+    # Convert to DataFrame (WITHOUT CMP COLUMN)
+    indices_df = pd.DataFrame(index_data, columns=["Indices", "% Change"])
+
+    # Remove None values and sort by % Change in descending order
+    indices_df = indices_df.dropna().sort_values(by="% Change", ascending=False)
+
+    # Stays numeric; shown with 2 decimals and colored by sign
+    styled_indices_df = style_change_table(indices_df, "% Change")
+
+    # Display the table
+    st.dataframe(styled_indices_df, height=450, hide_index=True, use_container_width=True)
+
+@st.fragment
+@timed_section
+def compare_section(start_date, end_date, point_budget):
+    """Depends on: NAV history of every selected strategy."""
+    strategies = list(load_strategies())
+    st.info("##### Compare Strategies")
+    names = st.multiselect("Strategies", strategies, default=strategies[:5], key="compare_strategies")
+    if not names:
+        st.warning("Select at least one strategy to compare.")
+        return
+
+    snapshots = fetch_strategy_snapshots(names)
+    missing = [name for name in names if name not in snapshots]
+    if missing:
+        st.warning(f"Could not load: {', '.join(missing)}")
+    ranges = {name: snapshot.nav_history.select_range(start_date, end_date) for name, snapshot in snapshots.items()}
+    ranges = {name: frame for name, frame in ranges.items() if not frame.empty}
+    if not ranges:
+        st.warning("No data available for the selected date range.")
+        return
+
+    with span("render.compare", strategies=len(ranges)):
+        figures = get_figure_cache()
+        view = (tuple((name, snapshots[name].nav_history.version) for name in ranges), start_date, end_date, point_budget)
+        compare_col1, compare_col2 = st.columns([3, 2])
+        with compare_col1:
+            st.markdown("**NAV (rebased to 100)**")
+            fig = figures.get(("compare_nav",) + view, lambda: build_compare_figure(ranges, "nav", point_budget, rebase=True))
+            st.plotly_chart(fig, use_container_width=True)
+            st.markdown("**Drawdown**")
+            fig = figures.get(("compare_dd",) + view, lambda: build_compare_figure(ranges, "dd", point_budget))
+            st.plotly_chart(fig, use_container_width=True)
+        with compare_col2:
+            st.markdown("**Returns**")
+            st.dataframe(compare_returns_table(ranges).style.format("{:.2f}%", na_rep="-"), use_container_width=True)
+
+@st.fragment
+@timed_section
+def tearsheet_section():
+    """Depends on: full NAV history (one report per data version)."""
+    name, url = selected_strategy()
+    history = load_page_snapshot().nav_history
+    tearsheets = get_tearsheets()
+    key = source_key(url)
+    state, detail = tearsheets.get(key, history.version, history.frame, name)
+    version = detail if state == "ready" else tearsheets.latest_ready(key)
+    if state == "failed":
+        st.warning(f"Performance report could not be built: {detail}")
+    elif state == "building":
+        st.caption(detail + (" Showing the report for earlier data meanwhile." if version else ""))
+        st.button("Check again", key="tearsheet_refresh")
+    if version is None:
+        return
+
+    html, metrics = tearsheets.read(key, version)
+    tab_metrics, tab_report = st.tabs(["Metrics", "Full report"])
+    with tab_metrics:
+        st.dataframe(metrics.fillna("").astype(str), use_container_width=True, height=600)
+    with tab_report:
+        components.html(html, height=1000, scrolling=True)
+    st.download_button("Download report (HTML)", html, file_name=f"{name} tearsheet.html", mime="text/html")
+
+# Main app content function
+def app_content():
+
+    st.set_page_config(layout="wide")  # Set full-width layout
+
+    strategies = load_strategies()
+    if len(strategies) > 1:
+        st.sidebar.selectbox("Strategy", list(strategies), key="strategy")
+
+    # One cached snapshot of the sheet; every section reads from it
+    snapshot = load_page_snapshot()
+    cache_stats = get_sheet_cache().stats
+    st.sidebar.caption(
+        f"Sheet cache: {cache_stats['hits']} hits, {cache_stats['stale_hits']} stale, "
+        f"{cache_stats['misses']} misses, {cache_stats['not_modified']} not modified, "
+        f"{cache_stats['published']} loaded from refresher; "
+        f"{get_fetch_coordinator().stats['shared']} fetches shared"
+    )
+    figures = get_figure_cache()
+    st.sidebar.caption(
+        f"Figure cache: {figures.stats['hits']} hits, {figures.stats['misses']} misses, "
+        f"{figures.stats['evictions']} evicted, {figures.size_mb:.1f} MB"
+    )
+    if snapshot.schema_report:
+        st.warning(f"Google Sheet layout changed: {snapshot.schema_report}")
+    data_at, error = get_sheet_cache().status(selected_strategy()[1])
+    if error:
+        st.warning(f"Showing the last good data from {stale_since(data_at, 0) or 'earlier'} ({error}); "
+                   f"refreshing in the background.")
+    nav_history = snapshot.nav_history
+    if len(nav_history) == 0:
+        st.error("No NAV history found in the Google Sheet.")
+        st.stop()
+
+    # Live mode reruns only the header on a timer (see live_header_section)
+    live = st.sidebar.toggle("Live header", value=is_market_open(), key="live_header",
+                             help=f"Refresh the account metrics and NIFTY50 every {LIVE_HEADER_INTERVAL:.0f}s")
+    if live:
+        live_header_section()
+    else:
+        header_section()
+
     #**************
-    # Extract the required columns for gainers and losers
-    top_10_gainers = data.iloc[:, [14, 15, 16]].head(10)  # Columns O, P, Q
-    top_10_gainers.columns = ["Symbol", "CMP", "Change%"]
-    
-    top_10_loosers = data.iloc[:, [18, 19, 20]].head(10)  # Columns S, T, U
-    top_10_loosers.columns = ["Symbol", "CMP", "Change%"]
-    
-    # Ensure "Change%" column is numeric after removing '%'
-    top_10_gainers["Change%"] = top_10_gainers["Change%"].str.replace('%', '').astype(float)
-    top_10_loosers["Change%"] = top_10_loosers["Change%"].str.replace('%', '').astype(float)
-    
-    # Define a function to apply color formatting
-    def color_grading(val):
-        """Color grading for 'Change%' column."""
-        if val > 0:
-            color = "green"
-        elif val < 0:
-            color = "red"
-        else:
-            color = "black"
-        return f"color: {color}"
-    
-    # Apply formatting using Pandas Styler
-    styled_gainers = top_10_gainers.style.map(color_grading, subset=["Change%"]).format({"Change%": "{:.2f}%"})
-    styled_loosers = top_10_loosers.style.map(color_grading, subset=["Change%"]).format({"Change%": "{:.2f}%"})
-    
-    # Hide index from the tables
-    styled_gainers = styled_gainers.hide(axis='index')
-    styled_loosers = styled_loosers.hide(axis='index')
+    top_10_gainers = snapshot.top_10_gainers
+    top_10_loosers = snapshot.top_10_loosers
+    stock_list = snapshot.stock_list
+
+    # Apply formatting using Pandas Styler (colors by sign, index hidden)
+    styled_gainers = style_change_table(top_10_gainers, "Change%")
+    styled_loosers = style_change_table(top_10_loosers, "Change%")
     #***************************
-    
+
     # Date Range Selector and Three-Column Layout
     col1, col2, col3 = st.columns([1, 4, 1])
     
     with col1:
         st.info("##### Date Range")
-        start_date = st.date_input("Start Date", value=pd.Timestamp(data['date'].min()).date(), key='start_date')
-        end_date = st.date_input("End Date", value=pd.Timestamp(data['date'].max()).date(), key='end_date')
+        start_date = st.date_input("Start Date", value=nav_history.first_date, key='start_date')
+        end_date = st.date_input("End Date", value=nav_history.last_date, key='end_date')
         st.markdown("<br><br><br>", unsafe_allow_html=True)
         
     
-        # Add "Top 10 Gainers" table with color grading
-        st.info("##### Today's Gainers")
-        # Display the table with index hidden
-        st.dataframe(styled_gainers, hide_index=True)
-    
-        # Add "Top 10 Losers" table with color grading
-        st.info("##### Today's Losers")
-        # Display the table with index hidden
-        st.dataframe(styled_loosers, hide_index=True)
+        with span("render.movers_tables"):
+            # Add "Top 10 Gainers" table with color grading
+            st.info("##### Today's Gainers")
+            # Display the table with index hidden
+            st.dataframe(styled_gainers, hide_index=True)
         
+            # Add "Top 10 Losers" table with color grading
+            st.info("##### Today's Losers")
+            # Display the table with index hidden
+            st.dataframe(styled_loosers, hide_index=True)
+
     # Apply the date filter
-    filtered_data = data[(data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))]
-    
-    if filtered_data.empty:
+    if nav_history.select_range(start_date, end_date).empty:
         st.error("No data available for the selected date range.")
         st.stop()
+
+    # Long ranges are downsampled (LTTB) to a fixed point budget; narrower ranges fall under it and show every row
+    full_detail = st.sidebar.toggle("Full-detail charts", value=False)
+    point_budget = None if full_detail else CHART_POINT_BUDGET
+
     #************************
     # Live Charts Section in col2
     with col2:
-        st.info("##### Model Live Chart")
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=filtered_data['date'], y=filtered_data['nav'], mode='lines', name='Strategy',
-                                 line=dict(color='#244bef', width=1)))
-        fig.add_trace(
-            go.Scatter(x=filtered_data['date'], y=filtered_data['nifty50 value'], mode='lines', name='Nifty50',
-                       line=dict(color='#FB3234', width=1)))
-        fig.update_layout(
-            height=600,
-            plot_bgcolor='#f0f2f6',  # Light grey background
-            xaxis=dict(
-                showgrid=True,  # Enable grid lines
-                gridcolor='white',  # Set grid lines to white
-                showline=True,  # Show axis lines
-                linecolor='white',  # Axis line color
-                tickfont=dict(size=16)  # Increase x-axis font size to 16
-            ),
-            yaxis=dict(
-                showgrid=True,  # Enable grid lines
-                gridcolor='white',  # Set grid lines to white
-                showline=True,  # Show axis lines
-                linecolor='white',  # Axis line color
-                tickfont=dict(size=16)  # Increase y-axis font size to 16
-            ),
-            legend=dict(
-                orientation="h",  # Horizontal orientation
-                yanchor="bottom",  # Align to bottom of the legend box
-                y=1.02,  # Place above the chart
-                xanchor="center",
-                x=0.5,  # Center the legend horizontally
-                font=dict(size=16)  # Increase legend font size to 16
-            )
-        )
-        st.plotly_chart(fig, use_container_width=True)
-    
-        st.info("##### Drawdown Live Chart")
-        fig_dd = go.Figure()
-        fig_dd.add_trace(go.Scatter(x=filtered_data['date'], y=filtered_data['dd'], mode='lines', name='Strategy Drawdown',
-                                    line=dict(color='#244bef', width=1)))
-        fig_dd.add_trace(
-            go.Scatter(x=filtered_data['date'], y=filtered_data['dd_n50'], mode='lines', name='Nifty50 Drawdown',
-                       line=dict(color='#FB3234', width=1)))
-        fig_dd.update_layout(
-            plot_bgcolor='#f0f2f6',
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='white',
-                showline=True,
-                linecolor='white',
-                tickfont=dict(size=16)  # Increase x-axis font size to 16
-            ),
-            yaxis=dict(
-                showgrid=True,
-                gridcolor='white',
-                showline=True,
-                linecolor='white',
-                tickfont=dict(size=16)  # Increase y-axis font size to 16
-            ),
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5,
-                font=dict(size=16)  # Increase legend font size to 16
-            )
-        )
-        st.plotly_chart(fig_dd, use_container_width=True)
+        charts_section(start_date, end_date, point_budget)
+        drawdown_section(start_date, end_date)
+        risk_section(start_date, end_date, point_budget)
+        calendar_section()
     
     #**********************
         # # Add Symbol Overview Widget below the charts
@@ -523,124 +3113,9 @@ def app_content():
         #     st.warning("No stocks available for the symbol overview widget.")
     
     #*****************
-    
-        # Dropdown to select a stock
-        if stock_list:
-            st.info("##### Portfolio Symbol Overview")
-            selected_stock = st.selectbox("",stock_list)
-        
-            # TradingView widget code
-            if selected_stock:
-                widget_code = f"""
-                <!-- TradingView Widget BEGIN -->
-                <div class="tradingview-widget-container" style="width: 100%; max-width: 980px; margin: 0 auto;">
-                    <div class="tradingview-widget-container__widget" style="height: 610px; width: 100%;"></div>
-                    <div class="tradingview-widget-copyright"></div>
-                    <script type="text/javascript" src="https://s3.tradingview.com/external-embedding/embed-widget-advanced-chart.js" async>
-                    {{
-                        "width": "935",
-                        "height": "530",
-                        "symbol": "{selected_stock}",
-                        "interval": "D",
-                        "timezone": "Etc/UTC",
-                        "theme": "light",
-                        "style": "1",
-                        "locale": "en",
-                        "allow_symbol_change": true,
-                        "calendar": false,
-                        "show_popup_button": true,
-                        "popup_width": "1000",
-                        "popup_height": "650",
-                        "hide_volume": true,
-                        "support_host": "https://www.tradingview.com"
-                    }}
-                    </script>
-                </div>
-                <!-- TradingView Widget END -->
-                """
-                # Render the widget in Streamlit
-                st.components.v1.html(widget_code, height=550)  # Height slightly more for padding
-        else:
-            st.warning("No stocks available in the portfolio.")
+        symbol_overview_section()
         #**********************************
-        # Streamlit App Layout
-        st.markdown("<h3 style='text-align: center;'>Heatmap</h3>", unsafe_allow_html=True)
-        
-        # Custom CSS to set background of Streamlit container to white
-        st.markdown("""
-            <style>
-                .reportview-container .main .block-container {
-                    background-color: white;
-                }
-                .css-1y4v0b4 {
-                    background-color: white;
-                }
-            </style>
-        """, unsafe_allow_html=True)
-        
-        if not portfolio_data.empty:
-            # Ensure "Today Change" is treated as a string, remove '%', and convert to numeric
-            portfolio_data["Today Change"] = (
-                portfolio_data["Today Change"]
-                .astype(str)  # Convert to string
-                .str.replace('%', '', regex=False)  # Remove '%' sign
-                .astype(float)  # Convert to float
-            )
-            
-            # Replace zero values in "Size" column with a small non-zero value
-            portfolio_data["Size"] = portfolio_data["Size"].replace(0, 0.01)
-        
-            # Create a treemap heatmap using Plotly
-            fig = px.treemap(
-                portfolio_data,
-                path=["Portfolio"],  # Stock names as labels
-                values="Size",  # Use "Size" column for box sizing
-                color="Today Change",  # Use "Today Change" for coloring
-                color_continuous_scale=[
-                    "#8B0000",  # Dark Red
-                    "#FF4500",  # Red-Orange
-                    "#FF6347",  # Tomato Red
-                    "#F0F0F0",  # Neutral Gray
-                    "#90EE90",  # Light Green
-                    "#32CD32",  # Lime Green
-                    "#006400"   # Dark Green
-                ],  # Custom color grading
-                range_color=[-5, 5],  # Fix color scale range to include negative values
-                custom_data=["Today Change"],  # Pass "Today Change" as custom data
-            )
-        
-            fig.update_traces(
-                textinfo="label+text",  # Show stock name and percentage change
-                texttemplate="%{label}<br>%{customdata[0]:.2f}%",  # Format text to show label and percentage change
-                textfont=dict(color="white"),
-                textfont_size=1,  # Increase font size
-                insidetextfont=dict(size=30, family="Arial"),  # Adjust inside text font properties
-                textposition="middle center",  # Center the text inside the box
-            )
-        
-            fig.update_layout(
-                margin=dict(t=0, l=0, r=0, b=50),  # Adjust margins to make space for the color bar
-                height=600,  # Fix height to control the chart’s size
-                coloraxis_colorbar=dict(
-                    title="Change (%)",
-                    tickvals=[-5, -3, -2, -1, 0, 1, 2, 3, 5],  # Custom tick values
-                    ticktext=["-5%", "-3%", "-2%", "-1%", "0%", "+1%", "+2%", "+3%", "+5%"],  # Custom tick labels
-                    orientation="h",  # Horizontal alignment
-                    x=0.5,  # Move to bottom center
-                    y=-0.1,  # Move below chart
-                    len=0.8,  # Length of the color bar
-                    thickness=10,  # Thickness of the color bar
-                    tickfont=dict(size=12, family="Arial"),  # Match font style
-                ),
-                # Set background color of the Plotly chart container
-                plot_bgcolor="white",  # Background inside the plot area
-                paper_bgcolor="white",  # Background outside the plot area
-            )
-        
-            # Display the treemap heatmap
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("No data available to display.")
+        heatmap_section()
         #********************************
         # Dynamically generate the symbols for the TradingView widget
         symbols = [
@@ -713,145 +3188,43 @@ def app_content():
         # Embed the widget in your Streamlit app using markdown
         components.html(widget_html, height=200)
     #**********************************************
-    
+
     # Model Performance Section in col3
     with col3:
-        st.info("##### Model Performance")
-        return_type = st.radio("Select Return Type", ['Inception', 'Yearly', 'Monthly', 'Weekly', 'Daily'], index=1)
-    
-        def calculate_performance(return_type):
-            latest_value = filtered_data['nav'].iloc[-1]
-            if return_type == 'Inception':
-                inception_value = filtered_data['nav'].iloc[0]
-                return (latest_value - inception_value) / inception_value * 100
-            elif return_type == 'Yearly':
-                past_date = filtered_data['date'].max() - pd.DateOffset(years=1)
-                yearly_data = filtered_data[filtered_data['date'] >= past_date]
-                if not yearly_data.empty:
-                    return (latest_value - yearly_data['nav'].iloc[0]) / yearly_data['nav'].iloc[0] * 100
-            elif return_type == 'Monthly':
-                past_date = filtered_data['date'].max() - pd.DateOffset(months=1)
-                monthly_data = filtered_data[filtered_data['date'] >= past_date]
-                if not monthly_data.empty:
-                    return (latest_value - monthly_data['nav'].iloc[0]) / monthly_data['nav'].iloc[0] * 100
-            elif return_type == 'Weekly':
-                past_date = filtered_data['date'].max() - pd.DateOffset(weeks=1)
-                weekly_data = filtered_data[filtered_data['date'] >= past_date]
-                if not weekly_data.empty:
-                    return (latest_value - weekly_data['nav'].iloc[0]) / weekly_data['nav'].iloc[0] * 100
-            elif return_type == 'Daily':
-                if len(filtered_data) > 1:
-                    return (filtered_data['nav'].iloc[-1] - filtered_data['nav'].iloc[-2]) / filtered_data['nav'].iloc[-2] * 100
-    
-        performance = calculate_performance(return_type)
-        if performance is not None:
-            st.write(f"{return_type} Performance: {performance:.2f}%")
-            st.markdown("<br><br><br><br>", unsafe_allow_html=True)
-        
-        # Add performance table
-        st.info("##### Performance Table")
-        
-        # Format the 'date' column to 'dd-mm-yyyy' format
-        table_data = filtered_data[['date', 'day change %', 'nifty50 change %']].copy()
-        
-        # Sort by 'date' in descending order (before formatting)
-        table_data.sort_values(by='date', ascending=False, inplace=True)
-        
-        # Format the 'date' column to 'dd-mm-yyyy' format
-        table_data['date'] = table_data['date'].dt.strftime('%d-%m-%Y')  # Format date
-        table_data.rename(columns={'date': 'Date','day change %': 'Strategy', 'nifty50 change %': 'Nifty50'}, inplace=True)
-        
-        # Round values to 2 decimal points (force format as string)
-        table_data['Strategy'] = table_data['Strategy'].apply(lambda x: f"{x:.2f}")
-        table_data['Nifty50'] = table_data['Nifty50'].apply(lambda x: f"{x:.2f}")
-        
-        
-        # Apply conditional formatting
-        def color_positive_negative(val):
-            """Style positive values green and negative values light red."""
-            color = '#caf1b0' if float(val) > 0 else '#FFD6D7'
-            return f'background-color: {color}'
-        
-        
-        # Display the table with formatting using st.dataframe
-        styled_table = table_data.style.map(color_positive_negative, subset=['Strategy', 'Nifty50'])
-        
-        # Show dataframe properly in Streamlit
-        st.dataframe(styled_table, hide_index=True)
-         # *******************************
-         # Add Market Indices Table with Live Data
-        st.info("##### Broader Indices")
-
-        # Define indices to fetch from Yahoo Finance
-        indices_dict = {
-            "NIFTY 50": "^NSEI",
-            "NIFTY BANK": "^NSEBANK",
-            "NIFTY NEXT 50": "^NSMIDCP",
-            "NIFTY 500": "^CRSLDX",
-            "NIFTY TOTAL MKT": "NIFTY_TOTAL_MKT.NS",
-            "N200MOMENTM30": "NIFTY200MOMENTM30.NS",
-            "NIFTY ALPHA 50": "NIFTYALPHA50.NS",
-            "MIDCAP 100": "NIFTY_MIDCAP_100.NS",
-            "SMLCAP 100": "^CNXSC",
-            "NIFTY MICROCAP250": "NIFTY_MICROCAP250.NS",
-            "INDIA VIX": "^INDIAVIX",
-            "Dow Jones": "^DJI",
-        }
-        
-        # Fetch live data
-        index_data = []
-        for name, ticker in indices_dict.items():
-            try:
-                index = yf.Ticker(ticker)
-                info = index.info
-                
-                # Get Live CMP with fallback
-                cmp = info.get("regularMarketPrice")  # Live CMP
-                if cmp is None:
-                    hist = index.history(period="1d")
-                    cmp = hist['Close'].iloc[-1] if not hist.empty else "N/A"  # Use last close if live price is missing
-
-                # Get Previous Close
-                prev_close = info.get("regularMarketPreviousClose", cmp)  # Use CMP if previous close is missing
-                
-                # Ensure valid numbers before calculation
-                if isinstance(cmp, (int, float)) and isinstance(prev_close, (int, float)) and prev_close > 0:
-                    percent_change = ((cmp - prev_close) / prev_close) * 100
-                    index_data.append([name, percent_change])  # Store as float for sorting
-                else:
-                    index_data.append([name, None])  # Handle missing values
-            
-            except Exception as e:
-                index_data.append([name, None])  # Handle errors
-        
-        # Convert to DataFrame (WITHOUT CMP COLUMN)
-        indices_df = pd.DataFrame(index_data, columns=["Indices", "% Change"])
-
-        # Remove None values and sort by % Change in descending order
-        indices_df = indices_df.dropna().sort_values(by="% Change", ascending=False)
+        performance_section(start_date, end_date)
+        # *******************************
+        # Add Market Indices Table with Live Data
+        indices_section()
 
-        # Format % Change column to show 2 decimal places
-        indices_df["% Change"] = indices_df["% Change"].apply(lambda x: f"{x:.2f}%")
+    # Side-by-side view once more than one strategy is registered
+    if len(strategies) > 1:
+        compare_section(start_date, end_date, point_budget)
 
-        # Apply styling for color coding
-        def color_format(val):
-            """Style positive values green and negative values red."""
-            try:
-                if val.endswith("%"):
-                    num_val = float(val.replace("%", ""))
-                    color = "green" if num_val > 0 else "red"
-                    return f"color: {color}"
-            except:
-                return ""  # No formatting for errors or 'N/A'
-
-        styled_indices_df = indices_df.style.map(color_format, subset=["% Change"])
+    with st.expander("Performance Report (QuantStats)"):
+        tearsheet_section()
 
-        # Display the table
-        st.dataframe(styled_indices_df, height=450, hide_index=True, use_container_width=True)
+    # Diagnostics: this run's spans, and percentiles over recent runs of every session
+    if st.sidebar.toggle("Diagnostics", value=False):
+        diagnostics = get_diagnostics()
+        run_spans = [
+            {"span": record["span"], "ms": record["ms"],
+             "details": ", ".join(f"{k}={v}" for k, v in record.items() if k not in ("span", "ms", "ts"))}
+            for record in diagnostics.run_spans() or []
+        ]
+        st.sidebar.caption("This run")
+        st.sidebar.dataframe(pd.DataFrame(run_spans, columns=["span", "ms", "details"]), hide_index=True)
+        st.sidebar.caption("Recent runs (all sessions)")
+        st.sidebar.dataframe(diagnostics.summary().round(1))
     # ***************************************************************
-if not st.session_state.logged_in:
-    login()
-else:
-    app_content()    
+# Streamlit runs this file as __main__; refresher.py and the benchmarks import it
+if __name__ == "__main__":
+    # Initialize session state for login
+    if "logged_in" not in st.session_state:
+        st.session_state.logged_in = False
 
-   
+    if not st.session_state.logged_in:
+        login()
+    else:
+        get_diagnostics().start_run()
+        with span("page"), get_page_fetcher().page(page_fetches(), PAGE_DEADLINE):
+            app_content()
@@ -0,0 +1,232 @@
+"""Offline benchmark of the dashboard's data pipeline.
+
+Runs every stage a page load goes through (sheet fetch, CSV parse, cleaning,
+history merge, range filter, performance maths, table styling, figure JSON)
+against synthetic sheets, with Google and Yahoo replaced by in-process stubs.
+Each stage is timed over a few repeats and run once more under tracemalloc
+for its peak Python-side allocation.
+
+Results are written to benchmarks/results/<git rev>.json (timings are machine
+specific, so that folder stays out of git) and two versions can be compared:
+
+    python benchmarks/bench_pipeline.py                       # full grid
+    python benchmarks/bench_pipeline.py --quick               # 1k/10k rows only
+    python benchmarks/bench_pipeline.py --compare 0bfa9c4     # diff against a saved run
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import timedelta
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+import numpy as np
+import plotly
+import requests
+import yfinance as yf
+from streamlit.elements.lib.pandas_styler_utils import marshall_styler
+from streamlit.proto.Arrow_pb2 import Arrow as ArrowProto
+
+import Strategy_performance as app
+from benchmarks.synthetic import make_sheet_csv, make_quotes_frame
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+ROW_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+HOLDING_SIZES = [30, 300, 3_000]
+REGRESSION_RATIO = 1.25   # slower than this vs the baseline gets flagged
+REGRESSION_FLOOR_S = 0.005  # ...unless the stage is too quick to time reliably
+
+#***********************
+# Stubbed upstreams
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {"ETag": '"bench"'}
+
+    def raise_for_status(self):
+        pass
+
+def stub_sheet(content):
+    """Patches requests.get to serve `content` as the published CSV."""
+    return mock.patch.object(requests, "get", lambda url, headers=None, timeout=None: FakeResponse(content))
+
+def stub_quotes():
+    """Patches yf.download to return five days of closes for every ticker."""
+    return mock.patch.object(yf, "download", lambda tickers, **kwargs: make_quotes_frame(tickers))
+
+#***********************
+# Stage runner
+
+def measure(fn, repeat):
+    """Best/median wall time over `repeat` runs plus peak traced memory of one extra run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"best_s": min(times), "median_s": statistics.median(times), "peak_mb": peak / 2**20}
+
+def render_styler(styler):
+    """What st.dataframe does with a Styler (raises past styler.render.max_elements)."""
+    marshall_styler(ArrowProto(), styler, "bench")
+
+def pipeline_stages(content):
+    """(name, callable) for every stage, each fed the previous stage's output."""
+    raw = app.read_sheet_csv(content)
+    snapshot = app.parse_sheet_snapshot(raw)
+    history = app.NavHistory(snapshot.history)
+    end = history.last_date
+    year_ago = end - timedelta(days=365)
+    filtered = history.select_range(year_ago, end)
+    everything = history.frame
+    tmp = tempfile.mkdtemp(prefix="bench-")
+
+    def sheet_fetch():
+        with stub_sheet(content):
+            app.SheetCache(ttl=0).refresh(app.google_sheets_url, retries=1)
+
+    def history_merge():
+        path = os.path.join(tmp, "history.parquet")
+        if os.path.exists(path):
+            os.remove(path)
+        app.HistoryStore(path).merge(snapshot.history)
+
+    return [
+        ("sheet_fetch (stubbed HTTP)", sheet_fetch),
+        ("read_csv", lambda: app.read_sheet_csv(content)),
+        ("parse_snapshot", lambda: app.parse_sheet_snapshot(raw)),
+        ("history_merge", history_merge),
+        ("nav_history_index", lambda: app.NavHistory(snapshot.history)),
+        ("select_range (1Y)", lambda: history.select_range(year_ago, end)),
+        ("performance_table", lambda: app.compute_performance_table(everything)),
+        ("calendar_returns", lambda: app.calendar_returns(everything, "nav")),
+        ("style_performance_table", lambda: render_styler(app.style_performance_table(everything))),
+        ("nav_figure_json", lambda: app.build_nav_figure(everything).to_json()),
+        ("drawdown_figure_json", lambda: app.build_drawdown_figure(everything).to_json()),
+        ("nav_figure_json (1Y)", lambda: app.build_nav_figure(filtered).to_json()),
+        ("heatmap_figure_json", lambda: app.build_heatmap_figure(snapshot.portfolio_data).to_json()),
+    ]
+
+def run_case(rows, holdings, repeat):
+    content = make_sheet_csv(rows, holdings)
+    case = {"rows": rows, "holdings": holdings, "csv_mb": len(content) / 2**20, "stages": {}}
+    for name, fn in pipeline_stages(content):
+        try:
+            case["stages"][name] = measure(fn, repeat)
+        except Exception as e:  # A stage that breaks at this size is a result too
+            case["stages"][name] = {"error": f"{type(e).__name__}: {e}"[:200]}
+        print(f"  {rows:>9,} rows {holdings:>5,} stocks  {name:<28} {format_stage(case['stages'][name])}")
+    return case
+
+def run_quotes(repeat):
+    tickers = list(app.INDICES.values())
+    with stub_quotes():
+        return {"fetch_quotes (stubbed Yahoo)": measure(lambda: app.fetch_quotes(tickers), repeat)}
+
+#***********************
+# Results
+
+def git_version():
+    """Short commit hash, with -dirty when the tree has local changes."""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def format_stage(result):
+    if "error" in result:
+        return f"ERROR {result['error']}"
+    return f"{result['best_s'] * 1000:10.1f} ms  {result['peak_mb']:8.1f} MB"
+
+def load_results(ref):
+    """A saved run by path or by version name."""
+    path = ref if os.path.exists(ref) else os.path.join(RESULTS_DIR, f"{ref}.json")
+    with open(path) as f:
+        return json.load(f)
+
+def compare(current, baseline):
+    """Prints per-stage time ratios; returns the number of regressions."""
+    def index(results):
+        return {(c["rows"], c["holdings"], name): r
+                for c in results["cases"] for name, r in c["stages"].items()}
+    old, new = index(baseline), index(current)
+    regressions = 0
+    print(f"\nCompared with {baseline['version']} (x = new time / old time):")
+    for key, result in new.items():
+        before = old.get(key)
+        if before is None or "best_s" not in result or "best_s" not in before:
+            continue
+        ratio = result["best_s"] / max(before["best_s"], 1e-9)
+        flag = ""
+        if ratio > REGRESSION_RATIO and result["best_s"] > REGRESSION_FLOOR_S:
+            flag = "  REGRESSION"
+            regressions += 1
+        rows, holdings, name = key
+        print(f"  {rows:>9,} rows {holdings:>5,} stocks  {name:<28} {ratio:6.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=lambda s: [int(x) for x in s.split(",")], default=ROW_SIZES)
+    parser.add_argument("--holdings", type=lambda s: [int(x) for x in s.split(",")], default=HOLDING_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="1k/10k rows with 30/300 holdings")
+    parser.add_argument("--compare", help="version name or results file to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+    if args.quick:
+        args.rows, args.holdings = [1_000, 10_000], [30, 300]
+
+    # Importing the app outside `streamlit run` logs a warning per cached call
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    warnings.simplefilter("ignore", pd.errors.DtypeWarning)
+
+    results = {
+        "version": git_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "packages": {"pandas": pd.__version__, "numpy": np.__version__, "plotly": plotly.__version__},
+        "repeat": args.repeat,
+        "cases": [],
+    }
+    for rows in args.rows:
+        for holdings in args.holdings:
+            results["cases"].append(run_case(rows, holdings, args.repeat))
+    results["cases"].append({"rows": 0, "holdings": 0, "stages": run_quotes(args.repeat)})
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{results['version']}.json")
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved {path}")
+    if args.compare:
+        if compare(results, load_results(args.compare)):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
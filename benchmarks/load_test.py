@@ -0,0 +1,148 @@
+"""Concurrent-session load test against recorded (replayed) data sources.
+
+Each simulated session repeatedly does what one page load does with data:
+sheet snapshot from the shared cache, index quotes, range filter,
+performance maths, figure JSON and table styling. Upstreams come from a
+replay directory (see "Data sources" in Strategy_performance.py), with
+optional injected latency and failures, so runs are repeatable offline.
+
+    # capture real responses once
+    DASHBOARD_DATA_SOURCE=record DASHBOARD_REPLAY_DIR=replay streamlit run Strategy_performance.py
+    # or seed the replay dir from a synthetic sheet
+    python benchmarks/load_test.py --replay-dir replay --synthetic 5000
+
+    python benchmarks/load_test.py --replay-dir replay --sessions 50 --latency 0.2-1.5 --failures 0.05
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class SpanCounter(logging.Handler):
+    """Counts the app's structured span log lines by span name."""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.counts = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        span = json.loads(record.getMessage())
+        with self._lock:
+            self.counts[span["span"]] += 1
+            if "error" in span:
+                self.errors[span["span"]] += 1
+
+
+def seed_replay_dir(app, replay_dir, rows, holdings):
+    """Writes a synthetic sheet and index quotes in the replay layout."""
+    from benchmarks.synthetic import make_sheet_csv, make_quotes_frame
+    store = app.ReplayStore(replay_dir)
+    store.save_sheet(app.google_sheets_url, app.SheetResponse(200, make_sheet_csv(rows, holdings), {"ETag": '"synthetic"'}))
+    tickers = list(app.INDICES.values())
+    store.save_quotes(tickers, make_quotes_frame(tickers))
+
+
+def page_load(app):
+    """The data work of one full page run (no Streamlit session needed)."""
+    from streamlit.elements.lib.pandas_styler_utils import marshall_styler
+    from streamlit.proto.Arrow_pb2 import Arrow as ArrowProto
+
+    snapshot = app.get_sheet_cache().get(app.google_sheets_url)
+    if snapshot is None:
+        raise RuntimeError("no sheet snapshot")
+    quotes = app.get_quotes()
+    app.build_nifty_quote(quotes.get(app.NIFTY_TICKER))
+    history = snapshot.nav_history
+    filtered = history.select_range(history.last_date - timedelta(days=365), history.last_date)
+    app.compute_performance_table(filtered)
+    app.build_nav_figure(filtered).to_json()
+    app.build_drawdown_figure(filtered).to_json()
+    app.build_heatmap_figure(snapshot.portfolio_data).to_json()
+    marshall_styler(ArrowProto(), app.style_performance_table(filtered), "load")
+
+
+def run_session(app, pages, think):
+    timings, errors = [], 0
+    for _ in range(pages):
+        start = time.perf_counter()
+        try:
+            page_load(app)
+            timings.append(time.perf_counter() - start)
+        except Exception:
+            errors += 1
+        time.sleep(think)
+    return timings, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replay-dir", required=True)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5, help="page loads per session")
+    parser.add_argument("--think", type=float, default=0.5, help="seconds between a session's page loads")
+    parser.add_argument("--latency", default="", help='injected per-call latency, "0.3" or "0.1-0.8"')
+    parser.add_argument("--failures", type=float, default=0.0, help="injected failure probability")
+    parser.add_argument("--seed", default="0")
+    parser.add_argument("--sheet-ttl", type=int, default=60)
+    parser.add_argument("--synthetic", type=int, metavar="ROWS", help="seed the replay dir with a synthetic sheet first")
+    parser.add_argument("--holdings", type=int, default=30)
+    args = parser.parse_args()
+
+    # The app reads its configuration from the environment at import time
+    os.environ.update({
+        "DASHBOARD_DATA_SOURCE": "replay",
+        "DASHBOARD_REPLAY_DIR": os.path.abspath(args.replay_dir),
+        "DASHBOARD_INJECT_LATENCY": args.latency,
+        "DASHBOARD_INJECT_FAILURES": str(args.failures),
+        "DASHBOARD_INJECT_SEED": args.seed,
+        "SHEET_CACHE_TTL": str(args.sheet_ttl),
+        "DASHBOARD_DATA_DIR": tempfile.mkdtemp(prefix="load-test-"),  # No refresher, fresh history
+    })
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    app = importlib.import_module("Strategy_performance")
+    if args.synthetic:
+        seed_replay_dir(app, args.replay_dir, args.synthetic, args.holdings)
+
+    counter = SpanCounter()
+    app.span_logger.addHandler(counter)
+    app.span_logger.setLevel(logging.INFO)
+    app.span_logger.propagate = False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        results = list(pool.map(lambda _: run_session(app, args.pages, args.think), range(args.sessions)))
+    elapsed = time.perf_counter() - started
+
+    timings = sorted(t for session, _ in results for t in session)
+    errors = sum(e for _, e in results)
+    print(f"{args.sessions} sessions x {args.pages} pages in {elapsed:.1f}s "
+          f"({len(timings) / elapsed:.1f} pages/s), {errors} failed pages")
+    if timings:
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"page ms: p50 {statistics.median(timings) * 1000:.0f}  p95 {p95 * 1000:.0f}  "
+              f"max {timings[-1] * 1000:.0f}")
+    print("upstream calls:", ", ".join(f"{name} {counter.counts[name]} ({counter.errors[name]} failed)"
+                                       for name in ("http.sheet", "yahoo.download", "yahoo.info", "yahoo.history")))
+    cache = app.get_sheet_cache().stats
+    print("sheet cache:", ", ".join(f"{key} {value}" for key, value in cache.items()))
+    fetches = app.get_fetch_coordinator().stats
+    print(f"fetch coordinator: {fetches['fetches']} upstream fetches, {fetches['shared']} shared")
+
+
+if __name__ == "__main__":
+    main()
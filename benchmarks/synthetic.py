@@ -0,0 +1,76 @@
+"""Synthetic Google Sheet exports shaped like the live dashboard sheet."""
+import numpy as np
+import pandas as pd
+
+
+def _pad(values, n):
+    """Column of length n: values first, blank cells after."""
+    values = list(values)
+    return values + [""] * (n - len(values))
+
+
+def _percent(values):
+    return pd.Series(values).map("{:.2f}%".format)
+
+
+def make_sheet_frame(rows=1000, holdings=30, seed=0):
+    """Sheet with `rows` NAV history rows and `holdings` portfolio stocks.
+
+    Columns sit at the same positions as the published sheet (movers in O-Q
+    and S-U) and cells are formatted the way Google exports them: thousands
+    separators, "%" suffixes and dd-Mon-yyyy dates.
+    """
+    rng = np.random.default_rng(seed)
+    # Daily rows run out of pandas' timestamp range past ~100k, so big sheets go hourly
+    if rows <= 50_000:
+        dates = pd.date_range("1900-01-01", periods=rows, freq="D").strftime("%d-%b-%Y")
+    else:
+        dates = pd.date_range("1900-01-01", periods=rows, freq="h").strftime("%d-%b-%Y %H:%M")
+    nav = 100 * np.cumprod(1 + rng.normal(0.0005, 0.01, rows))
+    n50 = 15000 * np.cumprod(1 + rng.normal(0.0003, 0.009, rows))
+    nav_change = np.r_[0, np.diff(nav) / nav[:-1] * 100]
+    n50_change = np.r_[0, np.diff(n50) / n50[:-1] * 100]
+    n = max(rows, holdings, 10)
+
+    return pd.DataFrame({
+        "Portfolio Value": _pad([f"{1234567:,}", "", f"{23456:,}", "", f"{1200000:,}"], n),
+        "Absolute Gain": _pad([f"{234567:,}", "", "18.5%"], n),
+        "Nifty50": _pad([f"{n50[-1]:,.2f}"], n),
+        "Date": _pad(dates, n),
+        "NAV": _pad(pd.Series(nav).map("{:,.2f}".format), n),
+        "Day Change %": _pad(_percent(nav_change), n),
+        "Nifty50 Value": _pad(pd.Series(n50).map("{:,.2f}".format), n),
+        "Nifty50 Change %": _pad(_percent(n50_change), n),
+        "DD": _pad(_percent((nav / np.maximum.accumulate(nav) - 1) * 100), n),
+        "DD_N50": _pad(_percent((n50 / np.maximum.accumulate(n50) - 1) * 100), n),
+        "Unused K": _pad([], n),
+        "Unused L": _pad([], n),
+        "Unused M": _pad([], n),
+        "Unused N": _pad([], n),
+        "Gainer": _pad([f"G{i}" for i in range(10)], n),
+        "Gainer CMP": _pad([f"{100 + i}" for i in range(10)], n),
+        "Gainer Change": _pad([f"{5 - i * 0.3:.2f}%" for i in range(10)], n),
+        "Unused R": _pad([], n),
+        "Loser": _pad([f"L{i}" for i in range(10)], n),
+        "Loser CMP": _pad([f"{100 + i}" for i in range(10)], n),
+        "Loser Change": _pad([f"{-5 + i * 0.3:.2f}%" for i in range(10)], n),
+        "Portfolio": _pad([f"STK{i}" for i in range(holdings)], n),
+        "Today Change": _pad(_percent(rng.normal(0, 2, holdings)), n),
+    })
+
+
+def make_sheet_csv(rows=1000, holdings=30, seed=0):
+    """CSV bytes as served by the published-sheet URL."""
+    return make_sheet_frame(rows, holdings, seed).to_csv(index=False).encode()
+
+
+def make_quotes_frame(tickers, days=5, seed=0):
+    """yf.download(group_by="ticker") shaped frame with a few days of closes."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days)
+    frames = {}
+    for ticker in tickers:
+        close = 1000 * np.cumprod(1 + rng.normal(0, 0.01, days))
+        frames[ticker] = pd.DataFrame({"Open": close, "High": close, "Low": close,
+                                       "Close": close, "Volume": 0}, index=index)
+    return pd.concat(frames, axis=1)
@@ -0,0 +1,104 @@
+# Background refresher for the Strategy Performance dashboard.
+# Polls every registered strategy's Google Sheet and the Yahoo quotes on an NSE market-hours
+# schedule and publishes versioned snapshots to the local snapshot store (see SnapshotStore in
+# Strategy_performance.py).
+# While this process keeps its heartbeat fresh, dashboards read those snapshots and never
+# call Google or Yahoo themselves, so upstream traffic no longer depends on the number of viewers.
+#
+# Run it next to the app (same working directory / DASHBOARD_DATA_DIR):
+#     python refresher.py
+import logging
+import os
+import time
+
+import Strategy_performance as app
+
+REFRESH_INTRADAY = float(os.environ.get("REFRESH_INTRADAY", "60"))         # seconds between polls while NSE is open
+REFRESH_AFTER_HOURS = float(os.environ.get("REFRESH_AFTER_HOURS", "1800"))  # trading day, outside market hours
+HEARTBEAT_INTERVAL = 60                                                     # seconds between heartbeats
+
+log = logging.getLogger("refresher")
+
+def poll_interval(now):
+    """Seconds between polls at `now` (IST), or None on weekends and NSE holidays."""
+    if app.is_market_open(now):
+        return REFRESH_INTRADAY
+    if app.is_trading_day(now.date()):
+        return REFRESH_AFTER_HOURS
+    return None
+
+class Refresher:
+    """Polls upstream sources and publishes what changed to a SnapshotStore."""
+
+    def __init__(self, store, urls):
+        self.store = store
+        self.urls = urls
+        self.validators = {}  # url -> (etag, last_modified) for conditional GETs
+        self.last_poll = None
+        self.failures = 0
+
+    def poll(self):
+        """Refreshes every sheet and the quotes; returns the names that failed.
+
+        Each one is tried on its own, so a broken sheet only marks its own entry
+        as failing (see SnapshotStore.status) and everything else still publishes.
+        """
+        failed = []
+        for url in self.urls:
+            name = f"sheet-{app.source_key(url)}"
+            try:
+                self.poll_sheet(url, name)
+            except Exception as e:
+                log.exception("sheet %s failed", app.source_key(url))
+                self.store.record_failure(name, f"{type(e).__name__}: {e}"[:200])
+                failed.append(name)
+        try:
+            quotes = app.fetch_quotes_with_backoff(list(app.INDICES.values()))
+            if not quotes:
+                raise ConnectionError("no quotes returned")
+            version = self.store.publish("quotes", app.quotes_to_json(quotes), "json")
+            log.info("quotes (%d/%d) -> %s", len(quotes), len(app.INDICES), version)
+        except Exception as e:
+            log.exception("quotes failed")
+            self.store.record_failure("quotes", f"{type(e).__name__}: {e}"[:200])
+            failed.append("quotes")
+        return failed
+
+    def poll_sheet(self, url, name):
+        etag, last_modified = self.validators.get(url, (None, None))
+        content, etag, last_modified = app.download_sheet_bytes(url, etag, last_modified)
+        if content is None:
+            self.store.confirm(name)  # 304 Not Modified
+            return
+        app.read_sheet_csv(content)  # Never publish a sheet the dashboard cannot parse
+        version = self.store.publish(name, content, "csv")
+        self.validators[url] = (etag, last_modified)  # Only once the content is published
+        log.info("sheet %s -> %s", app.source_key(url), version)
+
+    def is_due(self, now):
+        if self.last_poll is None:
+            return True  # Always poll once at startup, even on a holiday
+        interval = poll_interval(now)
+        return interval is not None and time.time() - self.last_poll >= interval
+
+    def run_forever(self):
+        while True:
+            now = app.now_ist()
+            if self.is_due(now):
+                started = time.time()  # Entries not confirmed since then count as stale
+                try:
+                    failed = self.poll()
+                except Exception:
+                    log.exception("poll failed")
+                    failed = ["poll"]
+                self.failures = self.failures + 1 if failed else 0
+                if failed:
+                    log.warning("poll had failures (%d in a row): %s", self.failures, ", ".join(failed))
+                self.last_poll = started
+            self.store.heartbeat(last_poll=self.last_poll, failures=self.failures,
+                                 market_open=app.is_market_open(now))
+            time.sleep(min(HEARTBEAT_INTERVAL, poll_interval(now) or HEARTBEAT_INTERVAL))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    Refresher(app.SnapshotStore(app.SNAPSHOT_DIR), list(app.load_strategies().values())).run_forever()
@@ -0,0 +1,21 @@
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+logging.getLogger("streamlit").setLevel(logging.ERROR)  # Bare-mode warnings from importing the app
+
+@pytest.fixture
+def history():
+    """Two years of business-day NAV and NIFTY50 random walks, with a few blank cells."""
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2022-01-03", periods=520)
+    nav = 100 * np.cumprod(1 + rng.normal(0.0005, 0.01, len(dates)))
+    nifty = 18000 * np.cumprod(1 + rng.normal(0.0003, 0.009, len(dates)))
+    nav[[50, 51, 300]] = np.nan
+    return pd.DataFrame({"date": dates, "nav": nav, "nifty50 value": nifty})
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+import Strategy_performance as app
+from benchmarks.synthetic import make_quotes_frame, make_sheet_csv
+
+def fail(breaker, times):
+    for _ in range(times):
+        assert breaker.allow()
+        breaker.record(False)
+
+def test_opens_after_threshold_and_closes_after_a_good_trial():
+    breaker = app.CircuitBreaker(threshold=3, cooldown=0.1)
+    fail(breaker, 2)
+    assert breaker.state == "closed"
+    fail(breaker, 1)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    time.sleep(0.12)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one trial call at a time
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+def test_failed_trial_reopens():
+    breaker = app.CircuitBreaker(threshold=2, cooldown=0.1)
+    fail(breaker, 2)
+    time.sleep(0.12)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert breaker.retry_in() > 0
+
+class FlakySource:
+    """Yahoo with some tickers that always fail their info/history lookups."""
+
+    def __init__(self, dead=()):
+        self.dead = set(dead)
+        self.sheet_up = True
+
+    def get_sheet(self, url, headers=None, timeout=30):
+        if not self.sheet_up:
+            raise ConnectionError("sheet down")
+        return "sheet"
+
+    def download_quotes(self, tickers, timeout):
+        return make_quotes_frame([t for t in tickers if t not in self.dead])
+
+    def ticker_info(self, ticker):
+        raise ConnectionError(f"no info for {ticker}")
+
+    def ticker_history(self, ticker, period):
+        raise ConnectionError(f"no history for {ticker}")
+
+def test_open_breaker_fails_fast():
+    source = app.GuardedSource(FlakySource(), threshold=2, cooldown=60)
+    source.source.sheet_up = False
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            source.get_sheet("https://example.com/a")
+    with pytest.raises(app.CircuitOpenError):
+        source.get_sheet("https://example.com/a")
+    source.source.sheet_up = True
+    assert source.get_sheet("https://example.com/b") == "sheet"  # Other sheets have their own breaker
+
+def test_dead_tickers_do_not_open_the_download_breaker(monkeypatch):
+    tickers = list(app.INDICES.values())
+    dead = [t for t in tickers if t != app.NIFTY_TICKER][:3]
+    source = app.GuardedSource(FlakySource(dead), threshold=3, cooldown=60)
+    monkeypatch.setattr(app, "get_data_source", lambda: source)
+    monkeypatch.setattr(app, "get_fetch_coordinator", lambda: app.FetchCoordinator(app.FETCH_LIMITS))
+    for _ in range(3):
+        quotes = app.fetch_quotes(tickers)
+    assert set(quotes) == set(tickers) - set(dead)
+    assert source.breaker("yahoo:download").state == "closed"
+    assert all(source.breaker(f"yahoo:{ticker}").state == "open" for ticker in dead)
+    assert app.NIFTY_TICKER in app.fetch_quotes([app.NIFTY_TICKER])
+
+def test_concurrent_publishes_keep_every_entry(tmp_path):
+    store = app.SnapshotStore(str(tmp_path))
+    errors = []
+    def publish(writer):
+        try:
+            for i in range(20):
+                store.publish(f"sheet-{writer}", f"{writer}-{i}".encode(), "csv")
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=publish, args=(w,)) for w in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(store.manifest()["entries"]) == [f"sheet-{w}" for w in range(6)]
+    assert not [p for p in tmp_path.rglob("*.tmp")]
+
+def test_failed_last_good_write_keeps_the_download(tmp_path, monkeypatch):
+    content = make_sheet_csv(rows=50, holdings=5)
+    monkeypatch.setattr(app, "download_sheet_bytes", lambda url, etag=None, last_modified=None, timeout=30:
+                        (content, '"v1"', None))
+    cache = app.SheetCache(ttl=60, history_dir=str(tmp_path))
+    def disk_full(*args):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(cache.last_good, "publish", disk_full)
+    snapshot = cache.refresh("https://example.com/sheet", retries=1)
+    assert snapshot is not None
+    assert cache.stats["downloads"] == 1 and cache.stats["errors"] == 0
+    assert cache.status("https://example.com/sheet")[1] is None
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import Strategy_performance as app
+
+def brute_force_episodes(values):
+    """(start, trough, recovery, depth) per drawdown by walking the rows one at a time."""
+    drawdown = app.percent_drawdown(values)
+    episodes, current = [], None
+    for i, level in enumerate(drawdown):
+        if level < 0:
+            if current is None:
+                current = [i - 1, i, -1, level]
+            elif level < current[3]:
+                current[1], current[3] = i, level
+        elif current is not None:
+            current[2] = i
+            episodes.append(current)
+            current = None
+    if current is not None:
+        episodes.append(current)
+    return episodes
+
+def test_incremental_update_matches_full_build(history):
+    incremental = app.DrawdownEpisodes('nav')
+    for end in range(1, len(history) + 1, 7):
+        incremental.update(history.iloc[:end])
+    incremental.update(history)
+    full = app.DrawdownEpisodes('nav')
+    full.update(history)
+    pd.testing.assert_frame_equal(incremental.snapshot(), full.snapshot())
+
+def test_matches_brute_force(history):
+    engine = app.DrawdownEpisodes('nav')
+    engine.update(history)
+    table = engine.snapshot()
+    expected = brute_force_episodes(history['nav'].to_numpy())
+    dates = history['date'].to_numpy()
+    assert len(table) == len(expected)
+    np.testing.assert_array_equal(table["Start"], dates[[e[0] for e in expected]])
+    np.testing.assert_array_equal(table["Trough"], dates[[e[1] for e in expected]])
+    np.testing.assert_allclose(table["Depth %"], [e[3] for e in expected])
+    assert table["Recovery"].isna().sum() == sum(e[2] == -1 for e in expected)
+
+def test_ongoing_drawdown_recovers_on_append():
+    dates = pd.bdate_range("2024-01-01", periods=6)
+    history = pd.DataFrame({"date": dates, "nav": [100, 110, 99, 95, 105, 112]})
+    engine = app.DrawdownEpisodes('nav')
+    engine.update(history.iloc[:5])
+    assert engine.snapshot()["Recovery"].isna().all()
+    assert engine.update(history)
+    table = engine.snapshot()
+    assert len(table) == 1
+    assert table.loc[0, "Recovery"] == dates[5]
+    assert table.loc[0, "Trough"] == dates[3]
+    assert not engine.update(history)
+
+def test_blank_row_at_the_peak_keeps_the_peak_on_append():
+    # Blank sheet cells arrive as 0; here one sits right after the peak the drawdown falls from
+    dates = pd.bdate_range("2024-01-01", periods=7)
+    history = pd.DataFrame({"date": dates, "nav": [100, 110, 0, 99, 95, 105, 0]})
+    for end in (5, 6, 7):
+        incremental = app.DrawdownEpisodes('nav')
+        incremental.update(history.iloc[:end - 1])
+        incremental.update(history.iloc[:end])
+        full = app.DrawdownEpisodes('nav')
+        full.update(history.iloc[:end])
+        pd.testing.assert_frame_equal(incremental.snapshot(), full.snapshot())
+    table = full.snapshot()
+    assert len(table) == 1 and table["Recovery"].isna().all()
+    assert table.loc[0, "Depth %"] == pytest.approx((95 / 110 - 1) * 100)
@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+import Strategy_performance as app
+
+def run_together(count, fn):
+    """Calls fn() from `count` threads at once; returns their results (exceptions included)."""
+    results = [None] * count
+    def call(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+def blocking_fetch(result):
+    """A fetch that waits until `release` is set, counting its calls."""
+    release = threading.Event()
+    calls = []
+    def fetch():
+        calls.append(1)
+        release.wait(timeout=10)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return fetch, release, calls
+
+def test_concurrent_calls_share_one_fetch():
+    coordinator = app.FetchCoordinator({"sheet": 4})
+    fetch, release, calls = blocking_fetch("snapshot")
+    threading.Timer(0.2, release.set).start()
+    results = run_together(8, lambda: coordinator.do("sheet", "url", fetch))
+    assert results == ["snapshot"] * 8
+    assert len(calls) == 1
+    assert coordinator.stats == {"fetches": 1, "shared": 7}
+    assert coordinator.inflight() == 0
+
+def test_exception_reaches_every_caller_and_is_not_cached():
+    coordinator = app.FetchCoordinator({"yahoo": 4})
+    fetch, release, calls = blocking_fetch(ConnectionError("down"))
+    threading.Timer(0.2, release.set).start()
+    results = run_together(5, lambda: coordinator.do("yahoo", "quotes", fetch))
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(calls) == 1
+    assert coordinator.inflight() == 0
+    assert coordinator.do("yahoo", "quotes", lambda: "recovered") == "recovered"
+
+def test_keys_do_not_share():
+    coordinator = app.FetchCoordinator({"sheet": 4})
+    assert coordinator.do("sheet", "a", lambda: 1) == 1
+    assert coordinator.do("sheet", "b", lambda: 2) == 2
+    assert coordinator.do("yahoo", "a", lambda: 3) == 3  # Kinds without a limit run unthrottled
+    assert coordinator.stats == {"fetches": 3, "shared": 0}
+
+def test_limit_caps_concurrent_fetches():
+    coordinator = app.FetchCoordinator({"sheet": 2})
+    running, peak, lock = [0], [0], threading.Lock()
+    release = threading.Event()
+    def fetch():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(timeout=10)
+        with lock:
+            running[0] -= 1
+    threading.Timer(0.3, release.set).start()
+    keys = iter(range(6))
+    key_lock = threading.Lock()
+    def call():
+        with key_lock:
+            key = next(keys)
+        return coordinator.do("sheet", key, fetch)
+    run_together(6, call)
+    assert peak[0] == 2
+    assert coordinator.inflight() == 0
+
+def test_base_exceptions_do_not_leak_inflight_entries():
+    coordinator = app.FetchCoordinator({})
+    def interrupted():
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        coordinator.do("sheet", "url", interrupted)
+    assert coordinator.inflight() == 0
@@ -0,0 +1,26 @@
+import plotly.graph_objects as go
+import pytest
+
+import Strategy_performance as app
+
+def test_size_estimate_is_close_to_the_json(history):
+    fig = app.build_nav_figure(history)
+    actual = len(fig.to_json(validate=False))
+    assert actual / 2 < app.figure_size(fig) < actual * 2
+
+def test_misses_never_encode_and_evict_least_recently_used(monkeypatch):
+    def no_encoding(*args, **kwargs):
+        raise AssertionError("figure encoded")
+    monkeypatch.setattr(go.Figure, "to_json", no_encoding)
+    figure = lambda: go.Figure(go.Scatter(x=list(range(100)), y=list(range(100))))
+    one_size = app.figure_size(figure())
+    cache = app.FigureCache(max_bytes=int(one_size * 2.5))
+    first = cache.get("a", figure)
+    cache.get("b", figure)
+    assert cache.get("a", pytest.fail) is first  # Hit: no build; "a" is now the most recent
+    cache.get("c", figure)
+    assert cache.stats == {"hits": 1, "misses": 3, "evictions": 1}
+    cache.get("a", pytest.fail)
+    rebuilt = []
+    cache.get("b", lambda: rebuilt.append(1) or figure())
+    assert rebuilt == [1]
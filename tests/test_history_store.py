@@ -0,0 +1,77 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import Strategy_performance as app
+from benchmarks.synthetic import make_sheet_csv
+
+def rows(dates, nav):
+    return pd.DataFrame({"date": dates, "nav": np.full(len(dates), float(nav))})
+
+def test_merge_upserts_and_keeps_rows_missing_upstream(tmp_path):
+    path = str(tmp_path / "nav_history.parquet")
+    store = app.HistoryStore(path)
+    dates = pd.bdate_range("2024-01-01", periods=10)
+    store.merge(rows(dates, 100))
+    fresh = rows(dates[5:], 100)
+    fresh.loc[fresh.index[-1], "nav"] = 120  # A corrected last day; the first five are no longer in the sheet
+    merged = store.merge(fresh)
+    assert len(merged) == 10
+    assert merged["nav"].iloc[-1] == 120
+    reopened = app.HistoryStore(path).load()
+    pd.testing.assert_frame_equal(reopened, merged)
+
+def test_unchanged_merge_does_not_rewrite(tmp_path):
+    path = tmp_path / "nav_history.parquet"
+    store = app.HistoryStore(str(path))
+    history = rows(pd.bdate_range("2024-01-01", periods=5), 100)
+    store.merge(history)
+    written = path.stat().st_mtime_ns
+    assert store.merge(history.copy()) is store.load()
+    assert path.stat().st_mtime_ns == written
+
+def test_concurrent_merges_keep_every_row(tmp_path):
+    store = app.HistoryStore(str(tmp_path / "nav_history.parquet"))
+    dates = pd.bdate_range("2024-01-01", periods=80)
+    start = threading.Barrier(8)
+    def merge(part):
+        start.wait()
+        store.merge(rows(dates[part * 10:(part + 1) * 10], part))
+    threads = [threading.Thread(target=merge, args=(part,)) for part in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.load()) == 80
+    reopened = app.HistoryStore(store.path).load()
+    assert list(reopened["date"]) == list(dates)
+
+def test_cold_start_serves_stored_history_while_the_sheet_is_slow(tmp_path, monkeypatch):
+    url = "https://example.com/sheet"
+    content = make_sheet_csv(rows=60, holdings=3)
+    monkeypatch.setattr(app, "download_sheet_bytes", lambda *args, **kwargs: (content, '"v1"', None))
+    first = app.SheetCache(ttl=60, history_dir=str(tmp_path))
+    stored = first.get(url).history
+    assert len(stored) > 0
+
+    release = threading.Event()
+    def slow_download(*args, **kwargs):
+        release.wait(timeout=10)
+        return content, '"v2"', None
+    monkeypatch.setattr(app, "download_sheet_bytes", slow_download)
+    restarted = app.SheetCache(ttl=60, history_dir=str(tmp_path))
+    started = time.monotonic()
+    snapshot = restarted.get(url)
+    assert time.monotonic() - started < 5
+    pd.testing.assert_frame_equal(snapshot.history, stored)
+    assert restarted.status(url)[1] is not None  # Marked as last good data until revalidated
+
+    release.set()
+    for _ in range(100):
+        if restarted.status(url)[1] is None:
+            break
+        time.sleep(0.05)
+    assert restarted.status(url)[1] is None
+    assert restarted.stats["downloads"] == 1
@@ -0,0 +1,27 @@
+import threading
+import time
+
+import pytest
+
+import Strategy_performance as app
+
+def test_jobs_wait_until_the_deadline():
+    fetcher = app.PageFetcher(2)
+    release = threading.Event()
+    with fetcher.page({"sheet": lambda: release.wait(timeout=10) and "late"}, deadline=0.1):
+        with pytest.raises(TimeoutError):
+            fetcher.result("sheet", lambda: "inline")
+    release.set()
+
+def test_names_without_a_job_run_inline_while_the_pool_is_busy():
+    fetcher = app.PageFetcher(1)
+    release = threading.Event()
+    busy = threading.Thread(target=lambda: fetcher.page({"sheet": lambda: release.wait(timeout=10)}, 5).__enter__())
+    busy.start()
+    busy.join()
+    # Another session's run with a cache hit: it has no job, so it never queues behind the slow one
+    with fetcher.page({}, deadline=0.1):
+        started = time.monotonic()
+        assert fetcher.result("quotes", lambda: "cached") == "cached"
+        assert time.monotonic() - started < 0.1
+    release.set()
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import Strategy_performance as app
+
+def navs(dates):
+    """A NAV that rises by 1 every row, and NIFTY50 at twice that, so each start row is easy to check."""
+    nav = 100 + np.arange(len(dates), dtype=float)
+    return pd.DataFrame({"date": dates, "nav": nav, "nifty50 value": 2 * nav})
+
+def level_on(history, day):
+    return history.loc[history['date'] == pd.Timestamp(day), 'nav'].item()
+
+def test_one_year_cagr_when_a_year_ago_is_a_weekend():
+    history = navs(pd.bdate_range("2022-01-03", "2024-06-03"))
+    assert pd.Timestamp("2023-06-03").dayofweek == 5  # A year before the last row is a Saturday
+    table = app.compute_performance_table(history)
+    start = level_on(history, "2023-06-05")  # First session on or after the target
+    growth = history['nav'].iloc[-1] / start
+    assert table.loc["1Y", "Strategy"] == pytest.approx((growth - 1) * 100)
+    years = (pd.Timestamp("2024-06-03") - pd.Timestamp("2023-06-05")).days / 365.25
+    assert table.loc["1Y", "Strategy CAGR"] == pytest.approx((growth ** (1 / years) - 1) * 100)
+    assert np.isnan(table.loc["6M", "Strategy CAGR"])
+
+def test_one_year_cagr_is_shown_for_every_end_date():
+    history = navs(pd.bdate_range("2021-01-01", periods=700))
+    for end in range(300, 700, 7):
+        table = app.compute_performance_table(history.iloc[:end])
+        first, last = history['date'].iloc[0], history['date'].iloc[end - 1]
+        covered = first <= last - pd.DateOffset(years=1)
+        assert np.isnan(table.loc["1Y", "Strategy CAGR"]) != covered, last
+
+def test_single_row():
+    table = app.compute_performance_table(navs(pd.DatetimeIndex(["2024-03-01"])))
+    assert np.isnan(table.loc["1D"]).all()
+    assert table[["Strategy CAGR", "Nifty50 CAGR"]].isna().all().all()
+    assert table.loc["Inception", "Strategy"] == 0
+
+@pytest.mark.parametrize("first_day, last_day, expected_start", [
+    ("2024-12-02", "2025-03-14", "2024-12-31"),  # The last session of last year is Dec 31
+    ("2023-12-01", "2024-03-15", "2023-12-29"),  # Dec 31 falls on a Sunday: from Friday's close
+    ("2025-01-01", "2025-03-14", "2025-01-01"),  # No rows last year: from the first row (Jan 1)
+])
+def test_ytd_starts_at_last_year_close(first_day, last_day, expected_start):
+    history = navs(pd.bdate_range(first_day, last_day))
+    table = app.compute_performance_table(history)
+    expected = (history['nav'].iloc[-1] / level_on(history, expected_start) - 1) * 100
+    assert table.loc["YTD", "Strategy"] == pytest.approx(expected)
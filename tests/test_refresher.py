@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+import Strategy_performance as app
+import refresher
+from benchmarks.synthetic import make_sheet_csv
+
+BROKEN = "https://example.com/broken"
+GOOD = "https://example.com/good"
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Google with one broken sheet, and Yahoo returning one quote."""
+    content = make_sheet_csv(rows=30, holdings=3)
+    def download(url, etag=None, last_modified=None, timeout=30):
+        if url == BROKEN:
+            raise FileNotFoundError(url)
+        return (None, etag, last_modified) if etag else (content, '"v1"', None)
+    monkeypatch.setattr(app, "download_sheet_bytes", download)
+    quotes = {app.NIFTY_TICKER: app.Quote(app.NIFTY_TICKER, 22000.0, 21900.0, as_of=time.time())}
+    monkeypatch.setattr(app, "fetch_quotes", lambda tickers, **kwargs: quotes)
+    monkeypatch.setattr(app, "backoff_delay", lambda attempt: 0)
+
+def test_broken_sheet_does_not_stop_the_others(tmp_path, upstream):
+    store = app.SnapshotStore(str(tmp_path))
+    poller = refresher.Refresher(store, [BROKEN, GOOD])
+    assert poller.poll() == [f"sheet-{app.source_key(BROKEN)}"]
+    entries = store.manifest()["entries"]
+    assert f"sheet-{app.source_key(GOOD)}" in entries and "quotes" in entries
+    assert store.status(f"sheet-{app.source_key(GOOD)}")[1] is None
+    assert "FileNotFoundError" in store.manifest()["failures"][f"sheet-{app.source_key(BROKEN)}"]["error"]
+
+def test_published_sheet_reports_failures_and_recovery(tmp_path, upstream):
+    store = app.SnapshotStore(str(tmp_path))
+    name = f"sheet-{app.source_key(GOOD)}"
+    poller = refresher.Refresher(store, [GOOD])
+    started = time.time()
+    poller.poll()
+    published_at = store.manifest()["entries"][name]["published_at"]
+    store.heartbeat(last_poll=started)
+    cache = app.SheetCache(ttl=60, snapshot_store=store)
+    assert cache.get(GOOD) is not None
+    assert cache.status(GOOD) == (published_at, None)
+
+    store.record_failure(name, "ConnectionError: down")
+    data_at, error = cache.status(GOOD)
+    assert data_at == published_at and error == "ConnectionError: down"
+
+    poller.poll()  # 304: still the same data, confirmed now
+    data_at, error = cache.status(GOOD)
+    assert data_at > published_at and error is None
+
+def test_entry_missing_from_the_last_poll_is_stale(tmp_path, upstream):
+    store = app.SnapshotStore(str(tmp_path))
+    refresher.Refresher(store, [GOOD]).poll()
+    store.heartbeat(last_poll=time.time() + 1)  # A later poll that no longer covers this sheet
+    assert store.status(f"sheet-{app.source_key(GOOD)}")[1] == "not refreshed by the last poll"
+
+def test_quotes_are_retried_with_backoff(tmp_path, upstream, monkeypatch):
+    answers = iter([{}, {app.NIFTY_TICKER: "quote"}])
+    monkeypatch.setattr(app, "fetch_quotes", lambda tickers, **kwargs: next(answers))
+    assert app.fetch_quotes_with_backoff([app.NIFTY_TICKER]) == {app.NIFTY_TICKER: "quote"}
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+import Strategy_performance as app
+
+WINDOWS = (5, 21, 63)
+
+def test_incremental_update_matches_full_build(history):
+    incremental = app.RollingRisk(WINDOWS)
+    for end in (1, 2, 30, 31, 200, len(history)):
+        incremental.update(history.iloc[:end])
+    full = app.RollingRisk(WINDOWS)
+    full.update(history)
+    for w in WINDOWS:
+        pd.testing.assert_frame_equal(incremental.snapshot()[w], full.snapshot()[w], rtol=1e-9)
+
+def test_matches_pandas_rolling(history):
+    engine = app.RollingRisk(WINDOWS, risk_free=0.0)
+    engine.update(history)
+    nav = history['nav'].where(history['nav'] > 0).ffill()  # Blank days are flat
+    returns = nav.pct_change(fill_method=None).fillna(0.0)
+    returns.iloc[0] = np.nan  # No return on the first row
+    bench = history['nifty50 value'].pct_change()
+    for w in WINDOWS:
+        frame = engine.snapshot()[w]
+        volatility = returns.rolling(w).std() * np.sqrt(app.TRADING_DAYS) * 100
+        correlation = returns.rolling(w).corr(bench)
+        np.testing.assert_allclose(frame["Volatility"], volatility, rtol=1e-6, atol=1e-9)
+        np.testing.assert_allclose(frame["Correlation"], correlation, rtol=1e-6, atol=1e-9)
+
+def test_changed_history_rebuilds(history):
+    engine = app.RollingRisk(WINDOWS)
+    engine.update(history)
+    assert not engine.update(history)
+    edited = history.copy()
+    edited.loc[10, 'nav'] *= 1.05  # A back-dated correction
+    assert engine.update(edited)
+    fresh = app.RollingRisk(WINDOWS)
+    fresh.update(edited)
+    pd.testing.assert_frame_equal(engine.snapshot()[21], fresh.snapshot()[21], rtol=1e-9)
+
+def test_zero_filled_blanks_are_flat_days(history):
+    # Blank sheet cells reach the engine as 0 (extract_history fills them)
+    clean = history.assign(nav=history['nav'].ffill())
+    blanked = clean.copy()
+    blanked.loc[[100, 300], 'nav'] = 0.0
+    with_blanks = app.RollingRisk((21,))
+    with_blanks.update(blanked.iloc[:250])
+    with_blanks.update(blanked)
+    reference = app.RollingRisk((21,))
+    reference.update(clean.assign(nav=clean['nav'].where(blanked['nav'] > 0).ffill()))
+    pd.testing.assert_frame_equal(with_blanks.snapshot()[21], reference.snapshot()[21], rtol=1e-9)
+    assert with_blanks.snapshot()[21]["Volatility"].max() < 100  # Not a -100% day